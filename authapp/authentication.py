@@ -0,0 +1,70 @@
+"""
+JWT authentication with the resolved user cached for a short time, so an
+authenticated request or WebSocket connection does not need an
+``auth_user`` query. Used by ``REST_FRAMEWORK`` and
+:class:`stocks.middleware.JWTAuthMiddleware`.
+"""
+import time
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import AuthenticationFailed, InvalidToken
+from rest_framework_simplejwt.settings import api_settings
+
+
+def _user_key(user_id):
+    return f"auth:user:{user_id}"
+
+
+def _revoked_key(jti):
+    return f"auth:revoked:{jti}"
+
+
+def invalidate_user(user_id):
+    """Drop the cached user so the next request reads it from the database."""
+    cache.delete(_user_key(user_id))
+
+
+def revoke_token(token):
+    """
+    Reject ``token`` (a validated access token) until it expires, e.g. after
+    logout. Access tokens are not blacklisted by simplejwt itself.
+    """
+    jti = token.get(api_settings.JTI_CLAIM)
+    if jti is None:
+        return
+    remaining = int(token["exp"] - time.time())
+    if remaining > 0:
+        cache.set(_revoked_key(jti), True, remaining)
+
+
+class CachedJWTAuthentication(JWTAuthentication):
+    def get_user(self, validated_token):
+        try:
+            user_id = validated_token[api_settings.USER_ID_CLAIM]
+        except KeyError:
+            raise InvalidToken("Token contained no recognizable user identification")
+
+        jti = validated_token.get(api_settings.JTI_CLAIM)
+        keys = [_user_key(user_id)] + ([_revoked_key(jti)] if jti else [])
+        cached = cache.get_many(keys)
+        if jti and cached.get(_revoked_key(jti)):
+            raise AuthenticationFailed("Token has been revoked", code="token_revoked")
+
+        user = cached.get(_user_key(user_id))
+        if user is None:
+            user = super().get_user(validated_token)
+            cache.set(_user_key(user_id), user, settings.JWT_USER_CACHE_TTL)
+        elif not user.is_active:
+            raise AuthenticationFailed("User is inactive", code="user_inactive")
+        return user
+
+
+@receiver(post_save, sender=get_user_model())
+@receiver(post_delete, sender=get_user_model())
+def _user_changed(sender, instance, **kwargs):
+    invalidate_user(instance.pk)
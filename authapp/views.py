@@ -4,6 +4,7 @@ from rest_framework.views import APIView
 from rest_framework.response import Response
 from rest_framework.permissions import AllowAny
 from rest_framework_simplejwt.tokens import RefreshToken
+from .authentication import invalidate_user, revoke_token
 from .serializers import RegisterSerializer, LoginSerializer
 
 # Registration view using JWT tokens
@@ -65,6 +66,10 @@ class LogoutView(APIView):
         try:
             token = RefreshToken(refresh_token)
             token.blacklist()  # Requires token blacklisting enabled
+            # Also retire the access token and the cached user it resolved to.
+            if request.auth is not None:
+                revoke_token(request.auth)
+            invalidate_user(request.user.pk)
             return Response({"detail": "Successfully logged out"}, status=status.HTTP_200_OK)
         except Exception as e:
             return Response({"detail": "Invalid refresh token"}, status=status.HTTP_400_BAD_REQUEST)
@@ -39,10 +39,12 @@ INSTALLED_APPS = [
     'channels',
 
     # Local apps
+    'authapp',
     'stocks',
 ]
 
 MIDDLEWARE = [
+    'stocks.middleware.ServerTimingMiddleware',
     'corsheaders.middleware.CorsMiddleware', 
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
@@ -117,18 +119,24 @@ DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 # REST Framework configuration with JWT authentication.
 REST_FRAMEWORK = {
     "DEFAULT_AUTHENTICATION_CLASSES": (
-        "rest_framework_simplejwt.authentication.JWTAuthentication",
+        "authapp.authentication.CachedJWTAuthentication",
     ),
     "DEFAULT_PERMISSION_CLASSES": [
         "rest_framework.permissions.IsAuthenticated",
     ],
 }
 
+# Listing endpoints paginate only when the client asks (cursor / page_size).
+LISTING_PAGE_SIZE = int(os.getenv('LISTING_PAGE_SIZE', 50))
+LISTING_MAX_PAGE_SIZE = int(os.getenv('LISTING_MAX_PAGE_SIZE', 200))
+
 # Simple JWT settings.
 SIMPLE_JWT = {
     'ACCESS_TOKEN_LIFETIME': timedelta(minutes=30),
     'REFRESH_TOKEN_LIFETIME': timedelta(days=1),
 }
+# Seconds a user resolved from a JWT is cached before it is re-read.
+JWT_USER_CACHE_TTL = int(os.getenv('JWT_USER_CACHE_TTL', 60))
 
 # Celery Configuration
 CELERY_BROKER_URL = os.getenv('CELERY_BROKER_URL')
@@ -138,7 +146,30 @@ CELERY_BEAT_SCHEDULE = {
         'task': 'stocks.tasks.check_stock_alerts',
         'schedule': crontab(minute='*/5'),
     },
+    'warm-quote-cache': {
+        'task': 'stocks.tasks.warm_quote_cache',
+        'schedule': timedelta(seconds=int(os.getenv('MARKET_DATA_WARM_INTERVAL', 45))),
+    },
+    'broadcast-subscribed-prices': {
+        'task': 'stocks.tasks.broadcast_prices',
+        'schedule': timedelta(seconds=int(os.getenv('PRICE_STREAM_INTERVAL', 5))),
+    },
+    'sync-price-history-every-30-minutes': {
+        'task': 'stocks.tasks.sync_price_history',
+        'schedule': crontab(minute='*/30', day_of_week='mon-fri'),
+    },
 }
+# Alert notifications are delivered by their own workers (see Procfile) so
+# slow SMTP or channel-layer calls never delay alert evaluation.
+CELERY_TASK_ROUTES = {
+    'stocks.tasks.deliver_alert_emails': {'queue': 'email'},
+    'stocks.tasks.deliver_alert_updates': {'queue': 'websocket'},
+}
+# How long a delivered notification is remembered so retries skip it.
+ALERT_NOTIFICATION_DEDUP_TTL = int(os.getenv('ALERT_NOTIFICATION_DEDUP_TTL', 24 * 60 * 60))
+# How long an attempt holds a notification while sending it. A worker that
+# dies mid-send loses its hold after this, and the retry sends it.
+ALERT_NOTIFICATION_CLAIM_TTL = int(os.getenv('ALERT_NOTIFICATION_CLAIM_TTL', 120))
 # To retain startup retry behavior, uncomment the line below:
 # CELERY_BROKER_CONNECTION_RETRY_ON_STARTUP = True
 
@@ -150,6 +181,8 @@ EMAIL_USE_TLS = os.getenv('EMAIL_USE_TLS') == 'True'
 EMAIL_HOST_USER = os.getenv('EMAIL_HOST_USER')
 EMAIL_HOST_PASSWORD = os.getenv('EMAIL_HOST_PASSWORD')
 DEFAULT_FROM_EMAIL = os.getenv('DEFAULT_FROM_EMAIL')
+# Alert emails per delivery job; each job reuses one SMTP connection.
+ALERT_EMAIL_BATCH_SIZE = int(os.getenv('ALERT_EMAIL_BATCH_SIZE', 100))
 
 CHANNEL_LAYERS = {
     "default": {
@@ -160,6 +193,122 @@ CHANNEL_LAYERS = {
     },
 }
 
+# Cache configuration. Redis in production (bound it with maxmemory and
+# maxmemory-policy allkeys-lru), local memory with LRU culling otherwise.
+MARKET_DATA_CACHE_ALIAS = 'market_data'
+MARKET_DATA_CACHE_MAX_ENTRIES = int(os.getenv('MARKET_DATA_CACHE_MAX_ENTRIES', 10000))
+if os.getenv('REDIS_URL'):
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': os.getenv('REDIS_URL'),
+        },
+        MARKET_DATA_CACHE_ALIAS: {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': os.getenv('REDIS_URL'),
+            'KEY_PREFIX': 'market_data',
+        },
+    }
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        },
+        MARKET_DATA_CACHE_ALIAS: {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+            'LOCATION': 'market-data',
+            'OPTIONS': {'MAX_ENTRIES': MARKET_DATA_CACHE_MAX_ENTRIES},
+        },
+    }
+
+# Market data provider: the live yfinance backend, or the offline replay
+# provider reading recorded fixtures from MARKET_DATA_REPLAY_DIR.
+MARKET_DATA_PROVIDER = os.getenv('MARKET_DATA_PROVIDER', 'stocks.providers.yahoo.YahooFinanceProvider')
+MARKET_DATA_REPLAY_DIR = os.getenv('MARKET_DATA_REPLAY_DIR', str(BASE_DIR / 'fixtures' / 'market_data'))
+MARKET_DATA_HTTP_POOL_SIZE = int(os.getenv('MARKET_DATA_HTTP_POOL_SIZE', 16))
+# Connect/read timeout for each upstream HTTP request, capping the 30s that
+# yfinance asks for.
+MARKET_DATA_HTTP_TIMEOUT = float(os.getenv('MARKET_DATA_HTTP_TIMEOUT', 5))
+
+# Market data cache TTLs (seconds)
+MARKET_DATA_PRICE_TTL = int(os.getenv('MARKET_DATA_PRICE_TTL', 60))
+MARKET_DATA_PROFILE_TTL = int(os.getenv('MARKET_DATA_PROFILE_TTL', 6 * 60 * 60))
+
+# Last good quote kept to serve while upstream is failing, and how long a
+# symbol upstream had no data for is skipped before being retried.
+MARKET_DATA_STALE_TTL = int(os.getenv('MARKET_DATA_STALE_TTL', 24 * 60 * 60))
+MARKET_DATA_NEGATIVE_TTL = int(os.getenv('MARKET_DATA_NEGATIVE_TTL', 120))
+
+# Circuit breaker around upstream calls: consecutive failures before it
+# opens, and seconds before a trial call is let through again.
+MARKET_DATA_BREAKER_THRESHOLD = int(os.getenv('MARKET_DATA_BREAKER_THRESHOLD', 5))
+MARKET_DATA_BREAKER_RESET_TIMEOUT = float(os.getenv('MARKET_DATA_BREAKER_RESET_TIMEOUT', 30))
+
+# Single-flight fetching: how long a fetch lease is held, and how long (and
+# how often) other callers poll for the lease holder's result.
+MARKET_DATA_FETCH_LEASE = int(os.getenv('MARKET_DATA_FETCH_LEASE', 10))
+MARKET_DATA_SINGLE_FLIGHT_WAIT = float(os.getenv('MARKET_DATA_SINGLE_FLIGHT_WAIT', 5))
+MARKET_DATA_SINGLE_FLIGHT_POLL = float(os.getenv('MARKET_DATA_SINGLE_FLIGHT_POLL', 0.05))
+
+# Upstream fetching: "batch" (one bulk download) or "concurrent" (per-symbol
+# calls fanned out over a shared, bounded thread pool).
+MARKET_DATA_FETCH_MODE = os.getenv('MARKET_DATA_FETCH_MODE', 'batch')
+MARKET_DATA_MAX_WORKERS = int(os.getenv('MARKET_DATA_MAX_WORKERS', 8))
+MARKET_DATA_FETCH_TIMEOUT = float(os.getenv('MARKET_DATA_FETCH_TIMEOUT', 5))
+MARKET_DATA_WARM_BATCH_SIZE = int(os.getenv('MARKET_DATA_WARM_BATCH_SIZE', 50))
+
+# Symbols a single ws/prices/ connection may subscribe to.
+PRICE_STREAM_MAX_SYMBOLS = int(os.getenv('PRICE_STREAM_MAX_SYMBOLS', 50))
+# Seconds a connection's subscriptions outlive its last refresh, so a
+# crashed Daphne process stops costing upstream fetches.
+PRICE_STREAM_SUBSCRIPTION_TTL = int(os.getenv('PRICE_STREAM_SUBSCRIPTION_TTL', 60))
+
+# Optional bearer token required to scrape /metrics/
+METRICS_TOKEN = os.getenv('METRICS_TOKEN')
+
+# Listing behind search autocomplete (CSV with symbol,name columns).
+SYMBOL_LISTING_FILE = os.getenv('SYMBOL_LISTING_FILE', str(BASE_DIR / 'stocks' / 'data' / 'symbols.csv'))
+SYMBOL_AUTOCOMPLETE_LIMIT = int(os.getenv('SYMBOL_AUTOCOMPLETE_LIMIT', 10))
+SYMBOL_AUTOCOMPLETE_MAX_LIMIT = int(os.getenv('SYMBOL_AUTOCOMPLETE_MAX_LIMIT', 50))
+
+# Seconds a user's cached portfolio snapshot lives before it is rebuilt.
+PORTFOLIO_SNAPSHOT_TTL = int(os.getenv('PORTFOLIO_SNAPSHOT_TTL', 24 * 60 * 60))
+
+# Days of daily bars fetched the first time a symbol's history is stored.
+PRICE_HISTORY_BACKFILL_DAYS = int(os.getenv('PRICE_HISTORY_BACKFILL_DAYS', 30))
+# Seconds before a request retries an inline backfill that returned no bars
+# (e.g. a delisted symbol).
+PRICE_HISTORY_BACKFILL_RETRY = int(os.getenv('PRICE_HISTORY_BACKFILL_RETRY', 600))
+
+# History endpoint: default and maximum points per downsampled series, and
+# how long a downsampled series is cached.
+CHART_DEFAULT_POINTS = int(os.getenv('CHART_DEFAULT_POINTS', 500))
+CHART_MAX_POINTS = int(os.getenv('CHART_MAX_POINTS', 2000))
+CHART_CACHE_TTL = int(os.getenv('CHART_CACHE_TTL', 300))
+
+# Logging: JSON lines by default (LOG_FORMAT=plain for local development).
+# LOG_LEVEL sets the root level; LOG_LEVELS overrides individual modules,
+# e.g. "stocks.views=DEBUG,stocks.market_data=WARNING".
+LOG_FORMAT = os.getenv('LOG_FORMAT', 'json')
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'formatters': {
+        'json': {'()': 'stocks.log_formatters.JsonFormatter'},
+        'plain': {'format': '%(asctime)s %(levelname)s %(name)s: %(message)s'},
+    },
+    'handlers': {
+        'console': {'class': 'logging.StreamHandler', 'formatter': LOG_FORMAT},
+    },
+    'root': {'handlers': ['console'], 'level': os.getenv('LOG_LEVEL', 'INFO')},
+    'loggers': {
+        'stocks': {'level': os.getenv('STOCKS_LOG_LEVEL', 'INFO')},
+    },
+}
+for _entry in filter(None, os.getenv('LOG_LEVELS', '').split(',')):
+    _name, _level = _entry.split('=', 1)
+    LOGGING['loggers'][_name.strip()] = {'level': _level.strip().upper()}
+
 # CORS settings
 CORS_ALLOW_ALL_ORIGINS = False  
 CORS_ALLOWED_ORIGINS = os.getenv("CORS_ALLOWED_ORIGINS").split(",") if os.getenv("CORS_ALLOWED_ORIGINS") else []
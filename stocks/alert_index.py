@@ -0,0 +1,168 @@
+"""
+Shared per-symbol threshold index of untriggered alerts.
+
+Each indexed symbol has one cache entry holding its sorted above/below
+trigger prices (see :mod:`stocks.alerting`), and ``alerts:index:symbols``
+lists the indexed symbols. The index is rebuilt from :class:`Alert` when
+that marker is missing (worker start-up, a cache flush or an evicted
+entry) and otherwise kept current by the alert views and
+``check_stock_alerts``, so matching a price costs one binary search per
+symbol plus the alerts it actually crosses.
+"""
+import logging
+import uuid
+from collections import defaultdict
+
+from django.core.cache import cache
+from django.db.models import Case, FloatField, IntegerField, Value, When
+from django.db.models.functions import Cast, Upper
+
+from . import alerting
+from .alerting import ABOVE, BELOW
+from .locks import cache_lock
+from .models import Alert
+
+logger = logging.getLogger(__name__)
+
+SYMBOLS_KEY = "alerts:index:symbols"
+GENERATION_KEY = "alerts:index:generation"
+LOCK_KEY = "alerts:index:lock"
+# A full rebuild reads every untriggered alert, so allow it some time.
+LOCK_LEASE = 30
+# Alert views and the alert check only wait this long for the lock (e.g.
+# behind a rebuild) before invalidating the index instead.
+UPDATE_WAIT = 1
+
+
+def _entry_key(symbol):
+    return f"alerts:index:{symbol}"
+
+
+def alert_rows():
+    """
+    ``(id, symbol, direction, trigger_price)`` for every untriggered alert,
+    normalised in SQL so building the arrays stays cheap.
+    """
+    return list(
+        Alert.objects.filter(triggered=False)
+        .annotate(
+            upper_symbol=Upper("symbol"),
+            direction=Case(
+                When(type__iexact="above", then=Value(ABOVE)),
+                When(type__iexact="below", then=Value(BELOW)),
+                default=Value(0),
+                output_field=IntegerField(),
+            ),
+            trigger_price=Cast("triggerPrice", FloatField()),
+        )
+        .values_list("id", "upper_symbol", "direction", "trigger_price")
+    )
+
+
+def rebuild():
+    """Rebuild the whole index from the database. Returns the indexed symbols."""
+    with cache_lock(LOCK_KEY, LOCK_LEASE):
+        generation = cache.get(GENERATION_KEY)
+        index = alerting.build_threshold_index(alert_rows())
+        stale = set(cache.get(SYMBOLS_KEY) or ()) - set(index)
+        cache.delete_many([_entry_key(symbol) for symbol in stale])
+        cache.set_many({_entry_key(symbol): entry for symbol, entry in index.items()}, None)
+        symbols = sorted(index)
+        # An update that gave up waiting for the lock while the rows were
+        # read may be missing; leave the marker unset so the next reader
+        # rebuilds.
+        if cache.get(GENERATION_KEY) == generation:
+            cache.set(SYMBOLS_KEY, symbols, None)
+    logger.info("Rebuilt alert index for %d symbols", len(symbols))
+    return symbols
+
+
+def symbols():
+    """Indexed symbols, rebuilding the index first if it is missing."""
+    indexed = cache.get(SYMBOLS_KEY)
+    return rebuild() if indexed is None else indexed
+
+
+def _invalidate():
+    # Dropping the marker forces the next reader to rebuild from the database.
+    cache.delete(SYMBOLS_KEY)
+    cache.set(GENERATION_KEY, uuid.uuid4().hex, None)
+
+
+def add(alert):
+    """Index a newly created alert."""
+    direction = {"above": ABOVE, "below": BELOW}.get(alert.type.lower())
+    if direction is None or alert.triggered:
+        return
+    symbol = alert.symbol.upper()
+    try:
+        with cache_lock(LOCK_KEY, LOCK_LEASE, UPDATE_WAIT):
+            indexed = cache.get(SYMBOLS_KEY)
+            if indexed is None:
+                return  # The next rebuild reads it from the database.
+            entry = cache.get(_entry_key(symbol))
+            if entry is None:
+                if symbol in indexed:
+                    _invalidate()
+                    return
+                entry = alerting.empty_entry()
+            # A rebuild may already have picked the alert up.
+            alerting.discard(entry, [alert.id])
+            alerting.insert(entry, alert.id, direction, float(alert.triggerPrice))
+            cache.set(_entry_key(symbol), entry, None)
+            if symbol not in indexed:
+                cache.set(SYMBOLS_KEY, sorted([*indexed, symbol]), None)
+    except TimeoutError:
+        logger.warning("Alert index busy; invalidating it after adding alert %s", alert.id)
+        _invalidate()
+
+
+def remove(ids_by_symbol):
+    """Drop ``{symbol: [alert_id, ...]}`` from the index."""
+    try:
+        with cache_lock(LOCK_KEY, LOCK_LEASE, UPDATE_WAIT):
+            indexed = cache.get(SYMBOLS_KEY)
+            if indexed is None:
+                return
+            cached = cache.get_many([_entry_key(symbol) for symbol in ids_by_symbol])
+            updated, emptied = {}, []
+            for symbol, alert_ids in ids_by_symbol.items():
+                entry = cached.get(_entry_key(symbol))
+                if entry is None:
+                    continue
+                alerting.discard(entry, list(alert_ids))
+                if alerting.is_empty(entry):
+                    emptied.append(symbol)
+                else:
+                    updated[_entry_key(symbol)] = entry
+            cache.set_many(updated, None)
+            if emptied:
+                cache.delete_many([_entry_key(symbol) for symbol in emptied])
+                cache.set(SYMBOLS_KEY, [symbol for symbol in indexed if symbol not in emptied], None)
+    except TimeoutError:
+        logger.warning("Alert index busy; invalidating it after removing alerts")
+        _invalidate()
+
+
+def match(prices):
+    """
+    ``{symbol: [alert_id, ...]}`` of indexed alerts crossed by
+    ``{symbol: price}``. A missing entry for an indexed symbol means it was
+    evicted, so the index is rebuilt before matching.
+    """
+    indexed = set(symbols())
+    wanted = [symbol for symbol in prices if symbol in indexed]
+    entries = cache.get_many([_entry_key(symbol) for symbol in wanted])
+    if len(entries) < len(wanted):
+        logger.warning("Alert index entries missing; rebuilding")
+        rebuild()
+        entries = cache.get_many([_entry_key(symbol) for symbol in wanted])
+
+    crossed = defaultdict(list)
+    for symbol in wanted:
+        entry = entries.get(_entry_key(symbol))
+        if entry is not None:
+            ids = alerting.crossed(entry, prices[symbol])
+            if len(ids):
+                crossed[symbol] = ids.tolist()
+    return dict(crossed)
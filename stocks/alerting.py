@@ -0,0 +1,123 @@
+"""
+Alert evaluation helpers: the vectorized scan over every alert and the
+sorted per-symbol threshold index ``check_stock_alerts`` matches prices
+against.
+"""
+from operator import itemgetter
+
+import numpy as np
+
+
+ABOVE = 1
+BELOW = -1
+
+
+def build_alert_arrays(rows, symbols):
+    """
+    Turn ``(id, symbol, direction, trigger_price)`` rows into parallel NumPy
+    arrays. ``direction`` is :data:`ABOVE`, :data:`BELOW` or 0 for unknown
+    alert types.
+
+    ``symbols`` is the ordered list of distinct symbols; each alert's position
+    in it is stored in ``symbol_index`` so a price vector can be broadcast
+    onto the alerts with a single fancy-index.
+    """
+    positions = {symbol: i for i, symbol in enumerate(symbols)}
+    count = len(rows)
+
+    def column(index, dtype):
+        return np.fromiter(map(itemgetter(index), rows), dtype=dtype, count=count)
+
+    symbol_index = np.fromiter(
+        map(positions.__getitem__, map(itemgetter(1), rows)), dtype=np.intp, count=count
+    )
+    directions = column(2, np.int8)
+    return (
+        column(0, np.int64),
+        symbol_index,
+        column(3, np.float64),
+        directions == ABOVE,
+        directions == BELOW,
+    )
+
+
+def evaluate_alerts(current_prices, trigger_prices, is_above, is_below):
+    """
+    Boolean mask of alerts whose condition is met. ``current_prices`` holds
+    the price for each alert; NaN (no price available) never triggers.
+    """
+    return (is_above & (current_prices >= trigger_prices)) | (
+        is_below & (current_prices <= trigger_prices)
+    )
+
+
+# ----- Sorted threshold index -----
+#
+# Per symbol, "above" and "below" trigger prices are kept sorted with their
+# alert IDs alongside. An above alert fires once the price reaches its
+# trigger, so the crossed ones are a prefix of the sorted above prices; below
+# alerts fire at or under their trigger, so they are a suffix of the below
+# prices. Either is found with one binary search.
+
+
+def empty_entry():
+    return {
+        "above_prices": np.empty(0, dtype=np.float64),
+        "above_ids": np.empty(0, dtype=np.int64),
+        "below_prices": np.empty(0, dtype=np.float64),
+        "below_ids": np.empty(0, dtype=np.int64),
+    }
+
+
+def build_threshold_index(rows):
+    """
+    Build ``{symbol: entry}`` from ``(id, symbol, direction, trigger_price)``
+    rows. Alerts of unknown direction are left out.
+    """
+    symbols = sorted({row[1] for row in rows})
+    alert_ids, symbol_index, trigger_prices, is_above, is_below = build_alert_arrays(rows, symbols)
+    index = {}
+    for side, selected in (("above", is_above), ("below", is_below)):
+        ids, positions, prices = alert_ids[selected], symbol_index[selected], trigger_prices[selected]
+        if not len(ids):
+            continue
+        # Sort by symbol, then price, and split into one run per symbol.
+        order = np.lexsort((prices, positions))
+        ids, positions, prices = ids[order], positions[order], prices[order]
+        starts = np.concatenate(([0], np.flatnonzero(np.diff(positions)) + 1))
+        ends = np.append(starts[1:], len(ids))
+        for start, end in zip(starts.tolist(), ends.tolist()):
+            entry = index.get(symbols[positions[start]])
+            if entry is None:
+                entry = index[symbols[positions[start]]] = empty_entry()
+            entry[f"{side}_prices"] = prices[start:end]
+            entry[f"{side}_ids"] = ids[start:end]
+    return index
+
+
+def crossed(entry, price):
+    """IDs of the alerts in ``entry`` that ``price`` triggers."""
+    above = np.searchsorted(entry["above_prices"], price, side="right")
+    below = np.searchsorted(entry["below_prices"], price, side="left")
+    return np.concatenate((entry["above_ids"][:above], entry["below_ids"][below:]))
+
+
+def insert(entry, alert_id, direction, trigger_price):
+    """Add one alert to ``entry`` in place, keeping its side sorted."""
+    side = "above" if direction == ABOVE else "below"
+    prices, ids = entry[f"{side}_prices"], entry[f"{side}_ids"]
+    position = np.searchsorted(prices, trigger_price, side="right")
+    entry[f"{side}_prices"] = np.insert(prices, position, trigger_price)
+    entry[f"{side}_ids"] = np.insert(ids, position, alert_id)
+
+
+def discard(entry, alert_ids):
+    """Remove ``alert_ids`` from ``entry`` in place."""
+    for side in ("above", "below"):
+        keep = ~np.isin(entry[f"{side}_ids"], alert_ids)
+        entry[f"{side}_prices"] = entry[f"{side}_prices"][keep]
+        entry[f"{side}_ids"] = entry[f"{side}_ids"][keep]
+
+
+def is_empty(entry):
+    return not len(entry["above_ids"]) and not len(entry["below_ids"])
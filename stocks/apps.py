@@ -4,3 +4,7 @@ from django.apps import AppConfig
 class StocksConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'stocks'
+
+    def ready(self):
+        # Registers the signal handlers that drop stale portfolio snapshots.
+        from . import portfolio  # noqa: F401
@@ -0,0 +1,60 @@
+"""
+Close-price series for the stock history endpoint.
+
+Bars are fetched through :mod:`stocks.market_data` for any range and
+interval upstream supports, downsampled to the requested point budget with
+:func:`stocks.downsampling.lttb`, and cached per (symbol, range, interval,
+points) in the market data cache.
+"""
+from django.conf import settings
+from django.core.cache import caches
+
+from . import market_data
+from .downsampling import lttb
+
+RANGES = ("1d", "5d", "1mo", "3mo", "6mo", "ytd", "1y", "2y", "5y", "10y", "max")
+INTRADAY_INTERVALS = ("1m", "2m", "5m", "15m", "30m", "60m", "90m", "1h")
+INTERVALS = INTRADAY_INTERVALS + ("1d", "5d", "1wk", "1mo", "3mo")
+# Upstream only keeps intraday bars for recent ranges.
+INTRADAY_RANGES = ("1d", "5d", "1mo")
+DEFAULT_INTERVALS = {"1d": "5m", "5d": "30m"}
+MIN_POINTS = 3
+
+
+def default_interval(range_):
+    return DEFAULT_INTERVALS.get(range_, "1d")
+
+
+def _key(symbol, range_, interval, points):
+    return f"chart:{symbol}:{range_}:{interval}:{points}"
+
+
+def series(symbol, range_, interval, points):
+    """
+    Closes for ``symbol`` as parallel ``{"dates", "prices"}`` arrays of at
+    most ``points`` entries, or ``None`` if upstream has no bars for it.
+    """
+    symbol = symbol.upper()
+    cache = caches[settings.MARKET_DATA_CACHE_ALIAS]
+    key = _key(symbol, range_, interval, points)
+    cached = cache.get(key)
+    if cached is not None:
+        return cached
+
+    bars = market_data.get_history(symbol, period=range_, interval=interval)
+    if bars is None or bars.empty:
+        return None
+    closes = bars["Close"].dropna()
+    if closes.empty:
+        return None
+
+    seconds = (closes.index - closes.index[0]).total_seconds().to_numpy()
+    prices = closes.to_numpy(dtype=float)
+    keep = lttb(seconds, prices, points)
+    date_format = "%Y-%m-%dT%H:%M" if interval in INTRADAY_INTERVALS else "%Y-%m-%d"
+    data = {
+        "dates": list(closes.index[keep].strftime(date_format)),
+        "prices": prices[keep].round(2).tolist(),
+    }
+    cache.set(key, data, settings.CHART_CACHE_TTL)
+    return data
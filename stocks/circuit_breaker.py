@@ -0,0 +1,89 @@
+"""
+Process-wide circuit breaker for upstream calls.
+
+After ``failure_threshold`` consecutive failures the breaker opens and
+calls fail immediately with :class:`CircuitOpen` instead of waiting on an
+unhealthy upstream. Once ``reset_timeout`` seconds have passed a single
+trial call is let through (half-open): success closes the breaker, failure
+opens it again.
+"""
+import threading
+import time
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+# Numeric state values for metrics.
+STATE_VALUES = {CLOSED: 0, HALF_OPEN: 1, OPEN: 2}
+
+
+class CircuitOpen(Exception):
+    """Raised instead of calling upstream while the breaker is open."""
+
+
+class CircuitBreaker:
+    def __init__(self, name, failure_threshold, reset_timeout):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self._lock = threading.Lock()
+        self._state = CLOSED
+        self._failures = 0
+        self._opened_at = 0.0
+        self._trial_running = False
+        self.counters = {"failures": 0, "rejected": 0, "opened": 0}
+
+    @property
+    def state(self):
+        with self._lock:
+            if self._state == OPEN and time.monotonic() - self._opened_at >= self.reset_timeout:
+                return HALF_OPEN
+            return self._state
+
+    def _allow(self):
+        with self._lock:
+            if self._state == CLOSED:
+                return True
+            if self._state == OPEN and time.monotonic() - self._opened_at >= self.reset_timeout:
+                self._state = HALF_OPEN
+            if self._state == HALF_OPEN and not self._trial_running:
+                self._trial_running = True
+                return True
+            self.counters["rejected"] += 1
+            return False
+
+    def record_success(self):
+        with self._lock:
+            self._state = CLOSED
+            self._failures = 0
+            self._trial_running = False
+
+    def record_failure(self):
+        with self._lock:
+            self.counters["failures"] += 1
+            self._failures += 1
+            self._trial_running = False
+            if self._state == HALF_OPEN or self._failures >= self.failure_threshold:
+                if self._state != OPEN:
+                    self.counters["opened"] += 1
+                self._state = OPEN
+                self._opened_at = time.monotonic()
+
+    def call(self, func, *args, ignore=(), **kwargs):
+        """
+        Run ``func`` through the breaker. Exceptions listed in ``ignore``
+        mean upstream answered (e.g. "no such symbol") and count as success.
+        """
+        if not self._allow():
+            raise CircuitOpen(f"{self.name} circuit is open")
+        try:
+            result = func(*args, **kwargs)
+        except ignore:
+            self.record_success()
+            raise
+        except Exception:
+            self.record_failure()
+            raise
+        self.record_success()
+        return result
@@ -1,8 +1,13 @@
+import asyncio
 import json
 import logging
+from asgiref.sync import sync_to_async
 from channels.generic.websocket import AsyncWebsocketConsumer
+from django.conf import settings
 from django.contrib.auth.models import AnonymousUser
 
+from . import subscriptions
+
 # Configure a logger for this module
 logger = logging.getLogger(__name__)
 
@@ -15,14 +20,14 @@ class AlertConsumer(AsyncWebsocketConsumer):
         else:
             self.group_name = f"user_{self.scope['user'].id}"
             await self.channel_layer.group_add(self.group_name, self.channel_name)
-            logger.info(f"User {self.scope['user'].id} connected. Added to group {self.group_name}.")
+            logger.info("User %s connected. Added to group %s.", self.scope["user"].id, self.group_name)
             await self.accept()
 
     async def disconnect(self, close_code):
         # Log disconnection details with context
         user_info = self.scope["user"].id if not self.scope["user"].is_anonymous else "Anonymous"
-        logger.info(f"User {user_info} disconnecting with close code {close_code}. "
-                    f"Channel: {self.channel_name}, Group: {getattr(self, 'group_name', 'N/A')}.")
+        logger.info("User %s disconnecting with close code %s. Channel: %s, Group: %s.",
+                    user_info, close_code, self.channel_name, getattr(self, "group_name", "N/A"))
         
         # Optionally, add more details if needed (e.g., request headers, scope info, etc.)
         if hasattr(self, "group_name") and self.channel_layer is not None:
@@ -31,3 +36,101 @@ class AlertConsumer(AsyncWebsocketConsumer):
     async def send_alert(self, event):
         alert = event["alert"]
         await self.send(text_data=json.dumps(alert))  # Send alert JSON to client
+
+    async def send_alerts(self, event):
+        # Alerts triggered together arrive as one JSON array frame.
+        await self.send(text_data=json.dumps(event["alerts"]))
+
+
+class PriceConsumer(AsyncWebsocketConsumer):
+    """
+    Streams price updates for the symbols a client subscribes to.
+
+    Clients send ``{"action": "subscribe" | "unsubscribe", "symbols": [...]}``.
+    Each symbol is a channel-layer group fed by the ``broadcast_prices``
+    task, so a symbol is fetched once per tick however many clients watch it.
+    While connected, the consumer keeps its registration in
+    :mod:`stocks.subscriptions` from expiring.
+    """
+
+    async def connect(self):
+        if self.scope["user"].is_anonymous:
+            logger.warning("Price stream connection attempt by an unauthenticated user; closing with code 403.")
+            await self.close(code=403)
+            return
+        self.symbols = set()
+        self.refresher = asyncio.ensure_future(self._refresh())
+        await self.accept()
+
+    async def disconnect(self, close_code):
+        refresher = getattr(self, "refresher", None)
+        if refresher is not None:
+            refresher.cancel()
+        symbols = getattr(self, "symbols", set())
+        if symbols:
+            await self._unsubscribe(symbols)
+
+    async def _refresh(self):
+        # Well inside the TTL, so one slow refresh does not drop the entry.
+        interval = settings.PRICE_STREAM_SUBSCRIPTION_TTL / 3
+        while True:
+            await asyncio.sleep(interval)
+            await self._record(subscriptions.subscribe, self.symbols)
+
+    async def _record(self, update, symbols):
+        # A failed registry write must not close the socket: a missed
+        # subscribe is retried by the next refresh, and a missed unsubscribe
+        # lapses with the TTL.
+        if not symbols:
+            return
+        try:
+            await sync_to_async(update)(self.channel_name, symbols)
+        except Exception:
+            logger.warning("Could not update price subscriptions for %s", self.channel_name, exc_info=True)
+
+    async def receive(self, text_data=None, bytes_data=None):
+        try:
+            message = json.loads(text_data or "")
+            action = message["action"]
+            symbols = message["symbols"]
+            if not isinstance(symbols, list) or not all(isinstance(symbol, str) for symbol in symbols):
+                raise TypeError("symbols must be a list of strings")
+            symbols = {symbol.upper() for symbol in symbols}
+        except (ValueError, KeyError, TypeError):
+            await self._error("Expected {\"action\": ..., \"symbols\": [...]}.")
+            return
+
+        invalid = sorted(symbol for symbol in symbols if not subscriptions.SYMBOL_PATTERN.match(symbol))
+        if invalid:
+            await self._error(f"Invalid symbols: {', '.join(invalid)}")
+            return
+
+        if action == "subscribe":
+            new = symbols - self.symbols
+            if len(self.symbols) + len(new) > settings.PRICE_STREAM_MAX_SYMBOLS:
+                await self._error(f"At most {settings.PRICE_STREAM_MAX_SYMBOLS} symbols per connection.")
+                return
+            for symbol in new:
+                await self.channel_layer.group_add(subscriptions.group_name(symbol), self.channel_name)
+            self.symbols |= new
+            await self._record(subscriptions.subscribe, new)
+        elif action == "unsubscribe":
+            await self._unsubscribe(symbols & self.symbols)
+        else:
+            await self._error(f"Unknown action: {action}")
+            return
+
+        await self.send(text_data=json.dumps({"type": "subscriptions", "symbols": sorted(self.symbols)}))
+
+    async def _unsubscribe(self, symbols):
+        for symbol in symbols:
+            await self.channel_layer.group_discard(subscriptions.group_name(symbol), self.channel_name)
+        # Rebind rather than update in place: ``symbols`` may be self.symbols.
+        self.symbols = self.symbols - symbols
+        await self._record(subscriptions.unsubscribe, symbols)
+
+    async def _error(self, message):
+        await self.send(text_data=json.dumps({"type": "error", "error": message}))
+
+    async def price_update(self, event):
+        await self.send(text_data=json.dumps({"type": "price", **event["quote"]}))
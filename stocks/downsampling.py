@@ -0,0 +1,46 @@
+"""
+Largest-Triangle-Three-Buckets downsampling.
+
+LTTB keeps the first and last points and splits the rest into equal-sized
+buckets. From each bucket it picks the point that forms the largest
+triangle with the point chosen before it and the average of the next
+bucket, so peaks and troughs survive while flat stretches thin out.
+"""
+import numpy as np
+
+
+def lttb(x, y, threshold):
+    """
+    Indices of the ``threshold`` points LTTB keeps from the series
+    ``(x, y)``; ``x`` must be increasing. Series that already fit (and
+    thresholds below 3) are returned whole.
+    """
+    x = np.asarray(x, dtype=np.float64)
+    y = np.asarray(y, dtype=np.float64)
+    n = len(x)
+    if threshold >= n or threshold < 3:
+        return np.arange(n)
+
+    # threshold - 2 buckets over the points between the first and the last.
+    edges = np.linspace(1, n - 1, threshold - 1).astype(np.int64)
+    counts = np.diff(edges)
+    avg_x = np.add.reduceat(x[:n - 1], edges[:-1]) / counts
+    avg_y = np.add.reduceat(y[:n - 1], edges[:-1]) / counts
+    # The last bucket looks ahead to the final point itself.
+    avg_x = np.append(avg_x, x[-1])
+    avg_y = np.append(avg_y, y[-1])
+
+    selected = np.empty(threshold, dtype=np.int64)
+    selected[0], selected[-1] = 0, n - 1
+    a = 0
+    for bucket in range(threshold - 2):
+        start, end = edges[bucket], edges[bucket + 1]
+        next_x, next_y = avg_x[bucket + 1], avg_y[bucket + 1]
+        # Twice the triangle areas; the factor does not change the argmax.
+        areas = np.abs(
+            (x[a] - next_x) * (y[start:end] - y[a])
+            - (x[a] - x[start:end]) * (next_y - y[a])
+        )
+        a = start + int(np.argmax(areas))
+        selected[bucket + 1] = a
+    return selected
@@ -0,0 +1,141 @@
+"""
+Persistent daily price history backed by :class:`stocks.models.PriceHistory`.
+
+Bars are appended incrementally by the ``sync_price_history`` task and read
+back by the overview endpoints with a single range query on the
+``(symbol, date)`` unique index.
+"""
+import logging
+from collections import defaultdict
+from datetime import timedelta
+
+import pandas as pd
+from django.conf import settings
+from django.core.cache import caches
+from django.db.models import Max
+from django.utils import timezone
+
+from . import market_data
+from .models import PriceHistory
+
+logger = logging.getLogger(__name__)
+
+BAR_FIELDS = ("open", "high", "low", "close", "volume")
+
+
+def empty_series():
+    return {"dates": [], "prices": []}
+
+
+def _backfill_failed_key(symbol):
+    return f"history:backfill_failed:{symbol}"
+
+
+def store_bars(bars):
+    """
+    Upsert ``{symbol: DataFrame}`` daily bars. Existing days are overwritten so
+    a partial intraday bar is finalised on the next sync. Returns the number
+    of rows written.
+    """
+    rows = []
+    for symbol, frame in bars.items():
+        for timestamp, bar in frame.iterrows():
+            rows.append(PriceHistory(
+                symbol=symbol,
+                date=timestamp.date(),
+                open=round(float(bar["Open"]), 4),
+                high=round(float(bar["High"]), 4),
+                low=round(float(bar["Low"]), 4),
+                close=round(float(bar["Close"]), 4),
+                volume=int(bar["Volume"]) if pd.notna(bar["Volume"]) else 0,
+            ))
+    if rows:
+        PriceHistory.objects.bulk_create(
+            rows,
+            batch_size=1000,
+            update_conflicts=True,
+            unique_fields=["symbol", "date"],
+            update_fields=list(BAR_FIELDS),
+        )
+    return len(rows)
+
+
+def sync(symbols):
+    """
+    Fetch only the bars each symbol is missing and append them.
+
+    Symbols are grouped by the date they need to resume from (their latest
+    stored date, re-fetched in case it was a partial day) so each group is
+    one bulk download. Symbols with no history are backfilled over
+    ``PRICE_HISTORY_BACKFILL_DAYS``.
+    """
+    symbols = sorted({symbol.upper() for symbol in symbols})
+    latest = dict(
+        PriceHistory.objects.filter(symbol__in=symbols)
+        .values("symbol")
+        .annotate(latest=Max("date"))
+        .values_list("symbol", "latest")
+    )
+    backfill_start = timezone.localdate() - timedelta(days=settings.PRICE_HISTORY_BACKFILL_DAYS)
+
+    groups = defaultdict(list)
+    for symbol in symbols:
+        groups[latest.get(symbol, backfill_start)].append(symbol)
+
+    written = 0
+    for start, group in groups.items():
+        try:
+            bars = market_data.get_bars(group, start=start)
+        except Exception:
+            logger.warning("Could not fetch price history for %s", group, exc_info=True)
+            continue
+        written += store_bars(bars)
+    return written
+
+
+def recent_closes(symbols, days=7):
+    """
+    Closes for the last ``days`` calendar days of every symbol as parallel
+    ``{"dates", "prices"}`` arrays, read with one indexed range query.
+    Symbols that have never been synced are backfilled inline first; one
+    whose backfill finds nothing is not retried for
+    ``PRICE_HISTORY_BACKFILL_RETRY`` seconds.
+    """
+    symbols = sorted({symbol.upper() for symbol in symbols})
+    since = timezone.localdate() - timedelta(days=days)
+
+    def query():
+        points = defaultdict(empty_series)
+        rows = (
+            PriceHistory.objects.filter(symbol__in=symbols, date__gte=since)
+            .order_by("symbol", "date")
+            .values_list("symbol", "date", "close")
+        )
+        for symbol, date, close in rows:
+            series = points[symbol]
+            series["dates"].append(date.strftime("%Y-%m-%d"))
+            series["prices"].append(round(float(close), 2))
+        return points
+
+    points = query()
+    missing = [symbol for symbol in symbols if symbol not in points]
+    if missing:
+        synced = set(
+            PriceHistory.objects.filter(symbol__in=missing)
+            .values_list("symbol", flat=True)
+            .distinct()
+        )
+        cache = caches[settings.MARKET_DATA_CACHE_ALIAS]
+        failed = cache.get_many([_backfill_failed_key(symbol) for symbol in missing])
+        never_synced = [
+            symbol for symbol in missing
+            if symbol not in synced and _backfill_failed_key(symbol) not in failed
+        ]
+        if never_synced:
+            sync(never_synced)
+            points = query()
+            cache.set_many(
+                {_backfill_failed_key(symbol): True for symbol in never_synced if symbol not in points},
+                settings.PRICE_HISTORY_BACKFILL_RETRY,
+            )
+    return {symbol: points.get(symbol) or empty_series() for symbol in symbols}
@@ -0,0 +1,175 @@
+"""
+Lightweight timing instrumentation for requests and Celery tasks.
+
+Hot paths wrap their work in ``timed(component)`` (``upstream``, ``db``,
+``render``, ...). While a request or task is being measured the durations
+add up per component, for the ``Server-Timing`` header. They also feed
+process-wide histograms that ``render_metrics`` exposes in the Prometheus
+text format. Each process (Daphne or Celery worker) keeps its own histograms.
+"""
+import contextvars
+import threading
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+
+from celery.signals import task_postrun, task_prerun
+from django.db import connection
+
+BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+
+class Histogram:
+    """A labelled, cumulative-bucket histogram in the Prometheus style."""
+
+    def __init__(self, name, documentation, label_names, buckets=BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.label_names = label_names
+        self.buckets = buckets
+        self._lock = threading.Lock()
+        self._series = {}
+
+    def observe(self, value, *labels):
+        with self._lock:
+            series = self._series.get(labels)
+            if series is None:
+                series = self._series[labels] = {
+                    "buckets": [0] * len(self.buckets),
+                    "sum": 0.0,
+                    "count": 0,
+                }
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series["buckets"][i] += 1
+            series["sum"] += value
+            series["count"] += 1
+
+    def render(self):
+        lines = [
+            f"# HELP {self.name} {self.documentation}",
+            f"# TYPE {self.name} histogram",
+        ]
+        with self._lock:
+            series = {labels: dict(data, buckets=list(data["buckets"])) for labels, data in self._series.items()}
+        for labels, data in sorted(series.items()):
+            label_text = ",".join(f'{name}="{value}"' for name, value in zip(self.label_names, labels))
+            prefix = f"{label_text}," if label_text else ""
+            for bound, count in zip(self.buckets, data["buckets"]):
+                lines.append(f'{self.name}_bucket{{{prefix}le="{bound}"}} {count}')
+            lines.append(f'{self.name}_bucket{{{prefix}le="+Inf"}} {data["count"]}')
+            lines.append(f"{self.name}_sum{{{label_text}}} {data['sum']:.6f}")
+            lines.append(f"{self.name}_count{{{label_text}}} {data['count']}")
+        return lines
+
+
+REQUEST_DURATION = Histogram(
+    "stocks_http_request_duration_seconds",
+    "HTTP request time by view and component.",
+    ("view", "component"),
+)
+TASK_DURATION = Histogram(
+    "stocks_celery_task_duration_seconds",
+    "Celery task time by task and component.",
+    ("task", "component"),
+)
+OPERATION_DURATION = Histogram(
+    "stocks_operation_duration_seconds",
+    "Duration of individual instrumented operations.",
+    ("component", "operation"),
+)
+
+_timings = contextvars.ContextVar("stocks_timings", default=None)
+
+
+def start():
+    """Begin collecting component timings for the current request or task."""
+    return _timings.set(defaultdict(float))
+
+
+def finish(token):
+    """Stop collecting and return ``{component: seconds}``."""
+    timings = _timings.get()
+    _timings.reset(token)
+    return timings or {}
+
+
+def add(component, seconds):
+    timings = _timings.get()
+    if timings is not None:
+        timings[component] += seconds
+
+
+@contextmanager
+def timed(component, operation=None):
+    """
+    Time the enclosed block under ``component``. When ``operation`` is given
+    the duration is also observed in the per-operation histogram.
+    """
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - started
+        add(component, elapsed)
+        if operation is not None:
+            OPERATION_DURATION.observe(elapsed, component, operation)
+
+
+def db_timer(execute, sql, params, many, context):
+    """``connection.execute_wrapper`` hook attributing query time to ``db``."""
+    with timed("db"):
+        return execute(sql, params, many, context)
+
+
+def breakdown(timings, total):
+    """
+    Split ``total`` into the measured components plus ``app`` for whatever
+    time was not attributed to any of them.
+    """
+    parts = dict(timings)
+    parts["app"] = max(total - sum(parts.values()), 0.0)
+    parts["total"] = total
+    return parts
+
+
+def server_timing_header(parts):
+    return ", ".join(f"{component};dur={seconds * 1000:.1f}" for component, seconds in parts.items())
+
+
+def observe_request(view, parts):
+    for component, seconds in parts.items():
+        REQUEST_DURATION.observe(seconds, view, component)
+
+
+def render_metrics(extra_lines=()):
+    lines = []
+    for histogram in (REQUEST_DURATION, TASK_DURATION, OPERATION_DURATION):
+        lines.extend(histogram.render())
+    lines.extend(extra_lines)
+    return "\n".join(lines) + "\n"
+
+
+# ----- Celery task instrumentation -----
+
+_running_tasks = {}
+
+
+@task_prerun.connect
+def _task_started(task_id=None, **kwargs):
+    connection.execute_wrappers.append(db_timer)
+    _running_tasks[task_id] = (start(), time.perf_counter())
+
+
+@task_postrun.connect
+def _task_finished(task_id=None, task=None, **kwargs):
+    started = _running_tasks.pop(task_id, None)
+    if db_timer in connection.execute_wrappers:
+        connection.execute_wrappers.remove(db_timer)
+    if started is None:
+        return
+    token, started_at = started
+    parts = breakdown(finish(token), time.perf_counter() - started_at)
+    name = task.name if task is not None else "unknown"
+    for component, seconds in parts.items():
+        TASK_DURATION.observe(seconds, name, component)
@@ -0,0 +1,80 @@
+"""
+Opt-in cursor pagination and sparse fieldsets for the listing endpoints.
+
+Responses stay the plain, complete lists they always were unless the client
+sends ``cursor`` or ``page_size``; pages then come wrapped with ``next`` and
+``previous`` links. ``fields=a,b`` limits the output to those fields, and
+the views use the parsed set to skip fetching what was left out.
+"""
+from bisect import bisect_left, bisect_right
+
+from django.conf import settings
+from rest_framework.exceptions import ValidationError
+from rest_framework.pagination import Cursor, CursorPagination
+
+
+def requested_fields(request, allowed):
+    """The ``fields`` query parameter as a set; all of ``allowed`` if absent."""
+    raw = request.query_params.get("fields")
+    if not raw:
+        return set(allowed)
+    fields = {name.strip() for name in raw.split(",") if name.strip()}
+    unknown = fields - set(allowed)
+    if unknown:
+        raise ValidationError({"fields": [f"Unknown fields: {', '.join(sorted(unknown))}."]})
+    return fields
+
+
+class OptInCursorPagination(CursorPagination):
+    page_size = settings.LISTING_PAGE_SIZE
+    max_page_size = settings.LISTING_MAX_PAGE_SIZE
+    page_size_query_param = "page_size"
+
+    def requested(self, request):
+        params = request.query_params
+        return self.cursor_query_param in params or self.page_size_query_param in params
+
+    def paginate_queryset(self, queryset, request, view=None):
+        if not self.requested(request):
+            return None
+        return super().paginate_queryset(queryset, request, view)
+
+    def paginate_keys(self, keys, request):
+        """
+        Paginate unique, sortable keys held in memory (the overall overview
+        pages over its cached snapshot, not a queryset). Cursors have the
+        same format as for querysets. Returns the page, or ``None`` when
+        pagination was not requested; the links are then ``next_link`` and
+        ``previous_link``.
+        """
+        if not self.requested(request):
+            return None
+        self.base_url = request.build_absolute_uri()
+        self.page_size = self.get_page_size(request)
+        cursor = self.decode_cursor(request)
+        keys = sorted(keys)
+        if cursor is None:
+            start, end = 0, self.page_size
+        elif cursor.reverse:
+            end = bisect_left(keys, cursor.position)
+            start = max(end - self.page_size, 0)
+        else:
+            start = bisect_right(keys, cursor.position)
+            end = start + self.page_size
+
+        page = keys[start:end]
+        self.next_link = self.previous_link = None
+        if page and end < len(keys):
+            self.next_link = self.encode_cursor(Cursor(offset=0, reverse=False, position=page[-1]))
+        if page and start > 0:
+            self.previous_link = self.encode_cursor(Cursor(offset=0, reverse=True, position=page[0]))
+        return page
+
+
+class WatchlistPagination(OptInCursorPagination):
+    ordering = "id"
+
+
+class PositionPagination(OptInCursorPagination):
+    # A user holds each symbol at most once, so it is a stable cursor key.
+    ordering = "symbol"
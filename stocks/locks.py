@@ -0,0 +1,32 @@
+"""
+Short-lived locks built on ``cache.add``, shared by every process that
+talks to the same cache (Daphne and Celery workers alike with Redis).
+"""
+import time
+import uuid
+from contextlib import contextmanager
+
+from django.core.cache import cache as default_cache
+
+
+@contextmanager
+def cache_lock(key, lease=5, wait=None, cache=None):
+    """
+    Hold ``key`` for the enclosed block. The lock expires after ``lease``
+    seconds so a crashed holder cannot wedge it; waiting more than ``wait``
+    seconds (default: ``lease``) for it raises ``TimeoutError``.
+    """
+    cache = cache or default_cache
+    token = uuid.uuid4().hex
+    deadline = time.monotonic() + (lease if wait is None else wait)
+    while not cache.add(key, token, lease):
+        if time.monotonic() > deadline:
+            raise TimeoutError(f"Could not acquire lock {key}")
+        time.sleep(0.01)
+    try:
+        yield
+    finally:
+        # Only release it if it is still ours; a block that overran the
+        # lease may have lost it to another holder.
+        if cache.get(key) == token:
+            cache.delete(key)
@@ -0,0 +1,133 @@
+import random
+import time
+from decimal import Decimal
+from types import SimpleNamespace
+
+import numpy as np
+from django.core.management.base import BaseCommand
+
+from stocks.alerting import (
+    ABOVE,
+    BELOW,
+    build_alert_arrays,
+    build_threshold_index,
+    crossed,
+    evaluate_alerts,
+)
+
+
+def _per_alert_loop(alerts, prices):
+    # The pre-vectorization logic, minus the network call per alert.
+    triggered = []
+    for alert in alerts:
+        current_price = prices.get(alert.symbol)
+        if current_price is None:
+            continue
+        if alert.type.lower() == "above" and current_price >= float(alert.triggerPrice):
+            triggered.append(alert.id)
+        elif alert.type.lower() == "below" and current_price <= float(alert.triggerPrice):
+            triggered.append(alert.id)
+    return triggered
+
+
+def _vectorized(rows, prices):
+    symbols = sorted(prices)
+    price_vector = np.array([prices[symbol] for symbol in symbols])
+    alert_ids, symbol_index, trigger_prices, is_above, is_below = build_alert_arrays(rows, symbols)
+    mask = evaluate_alerts(price_vector[symbol_index], trigger_prices, is_above, is_below)
+    return alert_ids[mask].tolist()
+
+
+def _indexed(index, prices):
+    return [
+        alert_id
+        for symbol, entry in index.items()
+        for alert_id in crossed(entry, prices[symbol]).tolist()
+    ]
+
+
+class Command(BaseCommand):
+    help = (
+        "Benchmark alert evaluation: the old per-alert loop against the "
+        "symbol-grouped NumPy comparison and the sorted threshold index. "
+        "Upstream calls are not made; the 'upstream calls' column shows how "
+        "many each approach would issue."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--sizes", type=int, nargs="+", default=[10_000, 100_000])
+        parser.add_argument("--symbols", type=int, default=10)
+        parser.add_argument("--repeat", type=int, default=5)
+        parser.add_argument("--seed", type=int, default=0)
+        parser.add_argument(
+            "--crossed-fraction", type=float, default=0.01,
+            help="Share of alerts whose threshold the current price has crossed.",
+        )
+
+    def handle(self, *args, **options):
+        rng = random.Random(options["seed"])
+        symbols = [f"SYM{i}" for i in range(options["symbols"])]
+        prices = {symbol: rng.uniform(10, 500) for symbol in symbols}
+
+        self.stdout.write(
+            f"{'alerts':>10} {'upstream calls':>16} {'loop (ms)':>12} "
+            f"{'numpy (ms)':>12} {'compare (ms)':>14} {'index (ms)':>12} {'crossed':>9}"
+        )
+        for size in options["sizes"]:
+            alerts = []
+            for i in range(size):
+                symbol = rng.choice(symbols)
+                alert_type = rng.choice(("above", "below"))
+                # Thresholds sit up to 20% away from the price, on the
+                # crossed side for ``--crossed-fraction`` of the alerts.
+                offset = rng.uniform(0.001, 0.2)
+                if (alert_type == "above") != (rng.random() < options["crossed_fraction"]):
+                    offset = -offset
+                alerts.append(SimpleNamespace(
+                    id=i,
+                    symbol=symbol,
+                    type=alert_type,
+                    triggerPrice=Decimal(f"{prices[symbol] * (1 - offset):.2f}"),
+                ))
+            # What the task reads: values_list rows normalised in SQL.
+            rows = [
+                (
+                    alert.id,
+                    alert.symbol.upper(),
+                    ABOVE if alert.type == "above" else BELOW,
+                    float(alert.triggerPrice),
+                )
+                for alert in alerts
+            ]
+            loop_ms = self._best_of(options["repeat"], _per_alert_loop, alerts, prices)
+            numpy_ms = self._best_of(options["repeat"], _vectorized, rows, prices)
+            assert _per_alert_loop(alerts, prices) == _vectorized(rows, prices)
+
+            # The comparison alone, once the arrays exist.
+            price_vector = np.array([prices[symbol] for symbol in sorted(prices)])
+            _, symbol_index, trigger_prices, is_above, is_below = build_alert_arrays(
+                rows, sorted(prices)
+            )
+            compare_ms = self._best_of(
+                options["repeat"],
+                lambda: evaluate_alerts(price_vector[symbol_index], trigger_prices, is_above, is_below),
+            )
+
+            # A tick against the prebuilt index: one bisect per symbol.
+            index = build_threshold_index(rows)
+            index_ms = self._best_of(options["repeat"], _indexed, index, prices)
+            matched = _indexed(index, prices)
+            assert sorted(matched) == _per_alert_loop(alerts, prices)
+            self.stdout.write(
+                f"{size:>10} {f'{size} -> {len(symbols)}':>16} {loop_ms:>12.2f} "
+                f"{numpy_ms:>12.2f} {compare_ms:>14.3f} {index_ms:>12.3f} {len(matched):>9}"
+            )
+
+    @staticmethod
+    def _best_of(repeat, func, *args):
+        best = float("inf")
+        for _ in range(repeat):
+            start = time.perf_counter()
+            func(*args)
+            best = min(best, time.perf_counter() - start)
+        return best * 1000
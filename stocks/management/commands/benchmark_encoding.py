@@ -0,0 +1,76 @@
+import gzip
+import random
+import time
+from datetime import date, timedelta
+
+from django.core.management.base import BaseCommand
+from rest_framework.renderers import JSONRenderer
+
+from stocks.renderers import ColumnarJSONRenderer, MessagePackRenderer
+
+
+def _series(rng, days):
+    start = date.today() - timedelta(days=days * 7 // 5)
+    dates, prices, price = [], [], rng.uniform(20, 500)
+    day = start
+    while len(dates) < days:
+        if day.weekday() < 5:
+            price *= 1 + rng.gauss(0, 0.02)
+            dates.append(day.strftime("%Y-%m-%d"))
+            prices.append(round(price, 2))
+        day += timedelta(days=1)
+    return {"dates": dates, "prices": prices}
+
+
+def _rows(series):
+    # What the default JSON representation builds: a dict per point.
+    return [{"date": date, "price": price} for date, price in zip(series["dates"], series["prices"])]
+
+
+def _payload(histories, shape):
+    return {
+        "stocks": [
+            {"symbol": symbol, "historicalData": shape(series)}
+            for symbol, series in histories.items()
+        ]
+    }
+
+
+class Command(BaseCommand):
+    help = (
+        "Benchmark encoding overview-style time series: the row-per-point "
+        "JSON shape against columnar JSON and MessagePack, by payload size "
+        "and the time to shape and serialize the response."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--symbols", type=int, default=40)
+        parser.add_argument("--days", type=int, default=252, help="Trading days per series (one year).")
+        parser.add_argument("--repeat", type=int, default=20)
+        parser.add_argument("--seed", type=int, default=0)
+
+    def handle(self, *args, **options):
+        rng = random.Random(options["seed"])
+        histories = {f"SYM{i}": _series(rng, options["days"]) for i in range(options["symbols"])}
+        encodings = [
+            ("json rows", JSONRenderer(), _rows),
+            ("json columnar", ColumnarJSONRenderer(), dict),
+            ("msgpack rows", MessagePackRenderer(), _rows),
+            ("msgpack columnar", MessagePackRenderer(), dict),
+        ]
+
+        self.stdout.write(f"{options['symbols']} symbols x {options['days']} points")
+        self.stdout.write(f"{'encoding':<18} {'bytes':>10} {'gzip bytes':>12} {'encode (ms)':>13}")
+        for name, renderer, shape in encodings:
+            body = renderer.render(_payload(histories, shape))
+            ms = self._best_of(options["repeat"], lambda: renderer.render(_payload(histories, shape)))
+            self.stdout.write(f"{name:<18} {len(body):>10} {len(gzip.compress(body)):>12} {ms:>13.3f}")
+
+    @staticmethod
+    def _best_of(repeat, func, *args):
+        best = float("inf")
+        for _ in range(repeat):
+            start = time.perf_counter()
+            func(*args)
+            best = min(best, time.perf_counter() - start)
+        return best * 1000
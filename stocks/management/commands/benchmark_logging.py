@@ -0,0 +1,76 @@
+import contextlib
+import logging
+import os
+import time
+
+from django.core.management.base import BaseCommand
+
+logger = logging.getLogger("stocks.views")
+
+
+def _fake_info(symbol, keys):
+    # yfinance info dicts carry well over a hundred mixed-type fields.
+    info = {f"field{i}": (i * 1.5 if i % 3 else f"value-{i}-{symbol}") for i in range(keys)}
+    info.update(symbol=symbol, longName=f"{symbol} Inc.", regularMarketPrice=123.45)
+    return info
+
+
+def _old_overview_logging(stocks):
+    # The print calls the overview view used to make for every stock.
+    overview = []
+    for symbol, info, chart_data, alerts in stocks:
+        print(f"Processing stock: {symbol}")
+        print(f"Ticker info for {symbol}: {info}")
+        print(f"Historical chart data for {symbol}: {chart_data}")
+        print(f"Alerts for {symbol}: {alerts}")
+        stock_overview = {"symbol": symbol, "price": info["regularMarketPrice"], "chartData": chart_data}
+        print(f"Overview for {symbol}: {stock_overview}")
+        overview.append(stock_overview)
+    print(f"Overall watchlist overview: {overview}")
+
+
+def _new_overview_logging(stocks):
+    # What remains: lazily formatted, level-gated records.
+    overview = []
+    for symbol, info, chart_data, alerts in stocks:
+        if not chart_data:
+            logger.debug("No historical data found for %s", symbol)
+        overview.append({"symbol": symbol, "price": info["regularMarketPrice"], "chartData": chart_data})
+    logger.debug("Overall overview: %d stocks", len(overview))
+
+
+class Command(BaseCommand):
+    help = "Benchmark per-request CPU spent on debug output in the overview endpoints."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--stocks", type=int, default=40)
+        parser.add_argument("--info-keys", type=int, default=150)
+        parser.add_argument("--requests", type=int, default=200)
+
+    def handle(self, *args, **options):
+        stocks = []
+        for i in range(options["stocks"]):
+            symbol = f"SYM{i}"
+            chart_data = [{"date": f"2025-01-0{day}", "price": 100.0 + day} for day in range(1, 8)]
+            alerts = [{"symbol": symbol, "type": "above", "triggerPrice": 150.0}]
+            stocks.append((symbol, _fake_info(symbol, options["info_keys"]), chart_data, alerts))
+
+        requests = options["requests"]
+        with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+            old_ms = self._cpu_per_call(requests, _old_overview_logging, stocks)
+        new_ms = self._cpu_per_call(requests, _new_overview_logging, stocks)
+
+        self.stdout.write(
+            f"{options['stocks']} stocks, {options['info_keys']}-key info dicts, "
+            f"logger level {logging.getLevelName(logger.getEffectiveLevel())}"
+        )
+        self.stdout.write(f"print-based: {old_ms:.3f} ms CPU/request")
+        self.stdout.write(f"logging:     {new_ms:.3f} ms CPU/request")
+        self.stdout.write(f"saved:       {old_ms - new_ms:.3f} ms CPU/request")
+
+    @staticmethod
+    def _cpu_per_call(count, func, *args):
+        started = time.process_time()
+        for _ in range(count):
+            func(*args)
+        return (time.process_time() - started) * 1000 / count
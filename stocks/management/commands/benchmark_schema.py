@@ -0,0 +1,191 @@
+import random
+import time
+
+from django.apps import apps
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+from django.db import connections
+from django.db.migrations.operations import RemoveConstraint, RemoveIndex
+from django.db.migrations.state import ProjectState
+
+from stocks.models import Alert, Stock, Watchlist
+
+# The schema this benchmark is about; "before" runs with these removed.
+SCHEMA_CHANGES = [
+    RemoveConstraint("stock", "unique_stock_user_symbol"),
+    RemoveIndex("alert", "alert_untriggered_symbol_idx"),
+]
+BATCH_SIZE = 10_000
+
+
+def _batched(rows):
+    batch = []
+    for row in rows:
+        batch.append(row)
+        if len(batch) == BATCH_SIZE:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+class Command(BaseCommand):
+    help = (
+        "Benchmark the hot stock and alert lookups on a seeded throwaway test "
+        "database, without and with the stocks indexes, printing each query "
+        "plan and its timing."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--database", default="default")
+        parser.add_argument("--stocks", type=int, default=1_000_000)
+        parser.add_argument("--alerts", type=int, default=5_000_000)
+        parser.add_argument("--users", type=int, default=10_000)
+        parser.add_argument("--symbols", type=int, default=5_000)
+        parser.add_argument(
+            "--untriggered-fraction", type=float, default=0.05,
+            help="Share of seeded alerts that have not fired yet.",
+        )
+        parser.add_argument("--lookups", type=int, default=200)
+        parser.add_argument("--seed", type=int, default=0)
+
+    def handle(self, *args, **options):
+        connection = connections[options["database"]]
+        # A separate test database: seeding never touches real data, and
+        # dropping it at the end is the cleanup.
+        old_name = connection.creation.create_test_db(verbosity=0, autoclobber=True, serialize=False)
+        try:
+            rng = random.Random(options["seed"])
+            self._change_schema(connection, backwards=False)
+            started = time.perf_counter()
+            samples = self._seed(connection, rng, options)
+            self.stdout.write(
+                f"Seeded {options['stocks']} stocks, {options['alerts']} alerts "
+                f"({connection.vendor}) in {time.perf_counter() - started:.1f}s"
+            )
+
+            self._run("before", connection, samples)
+            started = time.perf_counter()
+            self._change_schema(connection, backwards=True)
+            self.stdout.write(f"\nBuilt indexes in {time.perf_counter() - started:.1f}s")
+            self._run("after", connection, samples)
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+
+    def _change_schema(self, connection, backwards):
+        # Applied as migration operations so each backend gets its own DDL
+        # (SQLite, for one, rebuilds the table to drop a unique constraint).
+        states = [ProjectState.from_apps(apps)]
+        for operation in SCHEMA_CHANGES:
+            state = states[-1].clone()
+            operation.state_forwards("stocks", state)
+            states.append(state)
+        with connection.schema_editor() as editor:
+            if backwards:
+                for operation, before, after in reversed(list(zip(SCHEMA_CHANGES, states, states[1:]))):
+                    operation.database_backwards("stocks", editor, after, before)
+            else:
+                for operation, before, after in zip(SCHEMA_CHANGES, states, states[1:]):
+                    operation.database_forwards("stocks", editor, before, after)
+
+    def _seed(self, connection, rng, options):
+        alias = connection.alias
+        users = options["users"]
+        per_user = max(1, options["stocks"] // users)
+        pool = [f"S{i:04d}" for i in range(max(options["symbols"], per_user))]
+
+        User.objects.using(alias).bulk_create(
+            User(id=i, username=f"bench-{i}", password="!") for i in range(1, users + 1)
+        )
+        Watchlist.objects.using(alias).bulk_create(
+            Watchlist(id=i, user_id=i, name="Benchmark") for i in range(1, users + 1)
+        )
+
+        # Distinct symbols per user, so the unique constraint can be built.
+        positions = [
+            (user_id, symbol)
+            for user_id in range(1, users + 1)
+            for symbol in rng.sample(pool, per_user)
+        ][:options["stocks"]]
+        for batch in _batched(
+            Stock(id=i, user_id=user_id, symbol=symbol, name=symbol)
+            for i, (user_id, symbol) in enumerate(positions, start=1)
+        ):
+            Stock.objects.using(alias).bulk_create(batch)
+        through = Watchlist.stocks.through
+        for batch in _batched(
+            through(watchlist_id=user_id, stock_id=i)
+            for i, (user_id, _) in enumerate(positions, start=1)
+        ):
+            through.objects.using(alias).bulk_create(batch)
+
+        untriggered = options["untriggered_fraction"]
+
+        def alerts():
+            for _ in range(options["alerts"]):
+                stock_id = rng.randrange(len(positions)) + 1
+                yield Alert(
+                    stock_id=stock_id,
+                    symbol=positions[stock_id - 1][1],
+                    type=rng.choice(("above", "below")),
+                    message="Benchmark alert",
+                    severity="medium",
+                    triggerPrice=round(rng.uniform(10, 500), 2),
+                    triggered=rng.random() >= untriggered,
+                )
+
+        for batch in _batched(alerts()):
+            Alert.objects.using(alias).bulk_create(batch)
+
+        lookups = options["lookups"]
+        return {
+            "positions": [positions[rng.randrange(len(positions))] for _ in range(lookups)],
+            "symbols": [rng.choice(pool) for _ in range(lookups)],
+            "watchlists": [rng.randint(1, users) for _ in range(lookups)],
+        }
+
+    def _run(self, label, connection, samples):
+        alias = connection.alias
+        stocks = Stock.objects.using(alias)
+        alerts = Alert.objects.using(alias)
+        queries = [
+            (
+                "stock by (user, symbol)",
+                [stocks.filter(user_id=user_id, symbol=symbol) for user_id, symbol in samples["positions"]],
+            ),
+            (
+                "untriggered alerts by symbol",
+                [alerts.filter(triggered=False, symbol=symbol).values_list("id", "triggerPrice")
+                 for symbol in samples["symbols"]],
+            ),
+            (
+                "watchlist stocks (through table)",
+                [stocks.filter(watchlists=watchlist_id) for watchlist_id in samples["watchlists"]],
+            ),
+        ]
+
+        self.stdout.write(f"\n== {label} ==")
+        for name, querysets in queries:
+            self._report(name, querysets[0].explain(), self._ms_per_query(querysets))
+        # The alert index rebuild reads every untriggered alert at once.
+        rebuild = alerts.filter(triggered=False)
+        started = time.perf_counter()
+        rows = list(rebuild.values_list("id", "symbol", "type", "triggerPrice"))
+        self._report(
+            f"all untriggered alerts ({len(rows)} rows)",
+            rebuild.explain(),
+            (time.perf_counter() - started) * 1000,
+        )
+
+    def _report(self, name, plan, ms):
+        self.stdout.write(f"{name}: {ms:.3f} ms/query")
+        for line in plan.splitlines():
+            self.stdout.write(f"    {line}")
+
+    @staticmethod
+    def _ms_per_query(querysets):
+        started = time.perf_counter()
+        for queryset in querysets:
+            # A fresh clone each time, so no result cache is reused.
+            list(queryset.all())
+        return (time.perf_counter() - started) * 1000 / len(querysets)
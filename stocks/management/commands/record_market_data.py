@@ -0,0 +1,41 @@
+import json
+from pathlib import Path
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from stocks.models import Stock
+from stocks.providers.yahoo import YahooFinanceProvider
+
+
+class Command(BaseCommand):
+    help = (
+        "Record quotes and daily history from yfinance as fixtures for the "
+        "replay provider. Defaults to every symbol held in a watchlist."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("symbols", nargs="*")
+        parser.add_argument("--period", default="1y")
+        parser.add_argument("--output", default=settings.MARKET_DATA_REPLAY_DIR)
+
+    def handle(self, *args, **options):
+        symbols = sorted({s.upper() for s in options["symbols"]}) or sorted(
+            set(Stock.objects.values_list("symbol", flat=True))
+        )
+        if not symbols:
+            raise CommandError("No symbols given and no stocks in any watchlist.")
+
+        root = Path(options["output"])
+        (root / "quotes").mkdir(parents=True, exist_ok=True)
+        (root / "history").mkdir(parents=True, exist_ok=True)
+
+        provider = YahooFinanceProvider()
+        bars = provider.get_history(symbols, period=options["period"])
+        for symbol in symbols:
+            info = provider.get_quote(symbol)
+            (root / "quotes" / f"{symbol}.json").write_text(json.dumps(info, default=str, indent=1))
+            if symbol in bars:
+                frame = bars[symbol][["Open", "High", "Low", "Close", "Volume"]]
+                frame.to_csv(root / "history" / f"{symbol}.csv", index_label="Date", date_format="%Y-%m-%d")
+            self.stdout.write(f"{symbol}: {len(bars.get(symbol, []))} bars")
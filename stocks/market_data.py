@@ -0,0 +1,518 @@
+"""
+Shared market-data cache in front of the configured market-data provider.
+
+Quote fields are stored in two groups with their own TTLs: fast-moving price
+fields are kept for seconds, slow-moving profile fields (name, sector, market
+cap, dividends) for hours. Entries live in the ``market_data`` cache alias,
+which is size-bounded and evicts least-recently-used keys.
+
+Upstream calls go through a process-wide circuit breaker. While upstream is
+failing, quotes fall back to a long-lived stale copy of the last good
+quote, and symbols upstream has no data for are remembered for
+``MARKET_DATA_NEGATIVE_TTL`` seconds instead of being retried on every call.
+
+Fetches are single-flight across processes: the first caller to miss a
+symbol takes a short fetch lease on it (``cache.add``) and goes upstream;
+concurrent callers elsewhere wait for its result, or fall back to the stale
+quote, instead of all hitting upstream at once.
+"""
+import logging
+import math
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor, wait
+
+from django.conf import settings
+from django.core.cache import caches
+
+from .circuit_breaker import CircuitBreaker
+from .instrumentation import timed
+from .providers import SymbolNotFound, UpstreamError, get_provider
+
+logger = logging.getLogger(__name__)
+
+PRICE_FIELDS = (
+    "regularMarketPrice",
+    "regularMarketChange",
+    "regularMarketVolume",
+)
+PROFILE_FIELDS = (
+    "symbol",
+    "longName",
+    "sector",
+    "marketCap",
+    "dividendDate",
+    "dividendRate",
+    "dividendYield",
+)
+
+_stats_lock = threading.Lock()
+_stats = {"hits": 0, "misses": 0, "stale": 0, "negative": 0}
+
+upstream = CircuitBreaker(
+    "market_data",
+    failure_threshold=settings.MARKET_DATA_BREAKER_THRESHOLD,
+    reset_timeout=settings.MARKET_DATA_BREAKER_RESET_TIMEOUT,
+)
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def _cache():
+    return caches[settings.MARKET_DATA_CACHE_ALIAS]
+
+
+def _price_key(symbol):
+    return f"quote:price:{symbol}"
+
+
+def _profile_key(symbol):
+    return f"quote:profile:{symbol}"
+
+
+def _refreshed_key(symbol):
+    return f"quote:refreshed:{symbol}"
+
+
+def _stale_key(symbol):
+    return f"quote:stale:{symbol}"
+
+
+def _missing_key(symbol):
+    return f"quote:missing:{symbol}"
+
+
+def _lease_key(symbol):
+    return f"quote:lease:{symbol}"
+
+
+VERSION_KEY = "quote:version"
+
+
+def quote_version():
+    """
+    Counter that moves forward whenever fresh quotes are written. Together
+    with the price TTL it identifies the quote data a response was built from.
+    """
+    cache = _cache()
+    current = cache.get(VERSION_KEY)
+    if current is None:
+        cache.add(VERSION_KEY, time.time_ns(), None)
+        current = cache.get(VERSION_KEY)
+    return current
+
+
+def _bump_quote_version():
+    cache = _cache()
+    try:
+        cache.incr(VERSION_KEY)
+    except ValueError:
+        cache.add(VERSION_KEY, time.time_ns(), None)
+
+
+def _record(hit):
+    _count("hits" if hit else "misses")
+
+
+def _count(stat, amount=1):
+    with _stats_lock:
+        _stats[stat] += amount
+
+
+def _pick(info, fields):
+    # Only keep keys yfinance actually returned so callers' ``.get(key, default)``
+    # fallbacks behave exactly as they did against the raw info dict.
+    return {field: info[field] for field in fields if field in info}
+
+
+def _store_price(cache, symbol, price, profile):
+    cache.set(_price_key(symbol), price, settings.MARKET_DATA_PRICE_TTL)
+    cache.set(_refreshed_key(symbol), time.time(), settings.MARKET_DATA_PROFILE_TTL)
+    # Kept well past the price TTL so it can stand in while upstream is down.
+    cache.set(_stale_key(symbol), {**profile, **price}, settings.MARKET_DATA_STALE_TTL)
+
+
+def _remember_missing(symbol):
+    cache = _cache()
+    cache.set(_missing_key(symbol), True, settings.MARKET_DATA_NEGATIVE_TTL)
+
+
+def _stale_quotes(symbols):
+    """The last good quotes for ``symbols``, for use while upstream is failing."""
+    if not symbols:
+        return {}
+    stale = _cache().get_many([_stale_key(symbol) for symbol in symbols])
+    quotes = {symbol: stale[_stale_key(symbol)] for symbol in symbols if _stale_key(symbol) in stale}
+    if quotes:
+        _count("stale", len(quotes))
+        logger.info("Serving stale quotes for %s", sorted(quotes))
+    return quotes
+
+
+def store_quote(symbol, info):
+    """
+    Split a provider ``info`` dict into its price and profile groups and
+    write both to the cache. Returns the combined quote.
+    """
+    cache = _cache()
+    price = _pick(info, PRICE_FIELDS)
+    profile = _pick(info, PROFILE_FIELDS)
+    # A missing price is not worth remembering; the next caller retries.
+    if price.get("regularMarketPrice") is not None:
+        _store_price(cache, symbol, price, profile)
+    cache.set(_profile_key(symbol), profile, settings.MARKET_DATA_PROFILE_TTL)
+    return {**profile, **price}
+
+
+def _acquire(symbols):
+    """
+    Take the fetch lease for whichever of ``symbols`` nobody else is
+    fetching. Returns ``(token, owned_symbols)``.
+    """
+    cache = _cache()
+    token = uuid.uuid4().hex
+    owned = [
+        symbol for symbol in symbols
+        if cache.add(_lease_key(symbol), token, settings.MARKET_DATA_FETCH_LEASE)
+    ]
+    return token, owned
+
+
+def _release(token, symbols):
+    # Only drop leases that are still ours; an overrun one may have moved on.
+    cache = _cache()
+    held = cache.get_many([_lease_key(symbol) for symbol in symbols])
+    cache.delete_many([key for key, value in held.items() if value == token])
+
+
+def _await_fetch(symbols):
+    """
+    Wait up to ``MARKET_DATA_SINGLE_FLIGHT_WAIT`` for the lease holders of
+    ``symbols`` to cache fresh quotes. Returns ``(quotes, unresolved)``:
+    ``quotes`` maps a symbol to its fresh quote, or to ``{}`` if upstream had
+    no data for it; ``unresolved`` are symbols whose fetch ended without a
+    fresh quote or had not finished in time.
+    """
+    cache = _cache()
+    deadline = time.monotonic() + settings.MARKET_DATA_SINGLE_FLIGHT_WAIT
+    quotes, unresolved, pending = {}, [], list(symbols)
+    with timed("upstream", "single_flight_wait"):
+        while pending:
+            cached = cache.get_many([
+                key
+                for symbol in pending
+                for key in (_price_key(symbol), _profile_key(symbol), _missing_key(symbol), _lease_key(symbol))
+            ])
+            still_fetching = []
+            for symbol in pending:
+                price = cached.get(_price_key(symbol))
+                profile = cached.get(_profile_key(symbol))
+                if price is not None and profile is not None:
+                    quotes[symbol] = {**profile, **price}
+                elif _missing_key(symbol) in cached:
+                    quotes[symbol] = {}
+                elif _lease_key(symbol) in cached:
+                    still_fetching.append(symbol)
+                else:
+                    unresolved.append(symbol)
+            pending = still_fetching
+            if not pending or time.monotonic() >= deadline:
+                break
+            time.sleep(settings.MARKET_DATA_SINGLE_FLIGHT_POLL)
+    return quotes, unresolved + pending
+
+
+def get_quote(symbol):
+    """
+    Return the quote fields for ``symbol``. The provider is only asked when
+    either the price or the profile group has expired. Unknown symbols give
+    an empty quote, and are remembered as such for a short while. If
+    upstream fails, the last good quote is returned when there is one;
+    otherwise the error (``CircuitOpen`` while the breaker is open)
+    propagates to the caller.
+    """
+    symbol = symbol.upper()
+    cache = _cache()
+    cached = cache.get_many([_price_key(symbol), _profile_key(symbol), _missing_key(symbol)])
+    price = cached.get(_price_key(symbol))
+    profile = cached.get(_profile_key(symbol))
+    if price is not None and profile is not None:
+        _record(hit=True)
+        return {**profile, **price}
+    if _missing_key(symbol) in cached:
+        _count("negative")
+        return _stale_quotes([symbol]).get(symbol, {})
+
+    _record(hit=False)
+    logger.debug("Quote cache miss for %s", symbol)
+    token, owned = _acquire([symbol])
+    if owned:
+        try:
+            return _fetch_quote(symbol)
+        finally:
+            _release(token, owned)
+
+    quotes, _ = _await_fetch([symbol])
+    if quotes.get(symbol):
+        return quotes[symbol]
+    stale = _stale_quotes([symbol])
+    if symbol in stale:
+        return stale[symbol]
+    if symbol in quotes:
+        # Upstream answered without data.
+        return {}
+    # The lease holder failed and there is nothing stale; try ourselves.
+    return _fetch_quote(symbol)
+
+
+def _fetch_quote(symbol):
+    try:
+        info = upstream.call(get_provider().get_quote, symbol, ignore=(SymbolNotFound,))
+    except SymbolNotFound:
+        _remember_missing(symbol)
+        return _stale_quotes([symbol]).get(symbol, {})
+    except Exception:
+        stale = _stale_quotes([symbol])
+        if symbol in stale:
+            return stale[symbol]
+        raise
+    quote = store_quote(symbol, info)
+    if quote.get("regularMarketPrice") is None:
+        _remember_missing(symbol)
+    _bump_quote_version()
+    return quote
+
+
+def get_quotes(symbols):
+    """
+    Return ``{symbol: quote}`` for many symbols. Fully cached symbols are
+    served from one ``get_many``; the rest are filled by one batch quote
+    from the provider. Symbols that could not be fetched, or that are known
+    to have no data, fall back to their stale quote and are otherwise left
+    out.
+    """
+    symbols = sorted({symbol.upper() for symbol in symbols})
+    keys = [
+        key
+        for symbol in symbols
+        for key in (_price_key(symbol), _profile_key(symbol), _missing_key(symbol))
+    ]
+    cached = _cache().get_many(keys)
+
+    quotes, missing, negative = {}, [], []
+    for symbol in symbols:
+        price = cached.get(_price_key(symbol))
+        profile = cached.get(_profile_key(symbol))
+        if price is not None and profile is not None:
+            _record(hit=True)
+            quotes[symbol] = {**profile, **price}
+        elif _missing_key(symbol) in cached:
+            _count("negative")
+            negative.append(symbol)
+        else:
+            missing.append(symbol)
+    quotes.update(_stale_quotes(negative))
+
+    if missing:
+        if settings.MARKET_DATA_FETCH_MODE == "batch":
+            fetched = _fetch_quotes_single_flight(missing)
+        else:
+            fetched = fetch_concurrently(get_quote, missing)
+            fetched = {symbol: quote for symbol, quote in fetched.items() if quote}
+            fetched.update(_stale_quotes([symbol for symbol in missing if symbol not in fetched]))
+        quotes.update(fetched)
+    return quotes
+
+
+def _fetch_quotes_single_flight(symbols):
+    """
+    Batch-fetch the symbols this process wins the lease for and wait on the
+    others' lease holders, falling back to stale quotes for the rest.
+    """
+    token, owned = _acquire(symbols)
+    quotes = {}
+    if owned:
+        try:
+            quotes.update(_fetch_quotes(owned))
+        finally:
+            _release(token, owned)
+
+    waiting = [symbol for symbol in symbols if symbol not in owned]
+    if waiting:
+        awaited, unresolved = _await_fetch(waiting)
+        quotes.update({symbol: quote for symbol, quote in awaited.items() if quote})
+        quotes.update(_stale_quotes([symbol for symbol in waiting if symbol not in quotes]))
+    return quotes
+
+
+def get_bars(symbols, period=None, start=None):
+    """Daily OHLCV bars for many symbols from one bulk provider request."""
+    symbols = sorted({symbol.upper() for symbol in symbols})
+    if not symbols:
+        return {}
+    return upstream.call(get_provider().get_history, symbols, period=period, start=start)
+
+
+def get_history(symbol, period="1mo", interval="1d"):
+    """Bars for a single symbol, or ``None`` when the provider has none."""
+    symbol = symbol.upper()
+    bars = upstream.call(get_provider().get_history, [symbol], period=period, interval=interval)
+    return bars.get(symbol)
+
+
+def _fetch_quotes(symbols):
+    """
+    Quotes for a whole symbol set.
+
+    Price fields for every symbol come from one batch quote; profile fields
+    are read from the cache and only fall back to the provider's
+    fundamentals for symbols whose profile has expired. Symbols upstream
+    failed for fall back to their stale quote; only symbols upstream
+    answered for without any data are remembered as missing (and also get
+    their stale quote, if any). Symbols with neither are left out.
+    """
+    symbols = sorted({symbol.upper() for symbol in symbols})
+    if not symbols:
+        return {}
+
+    provider = get_provider()
+    try:
+        prices, failed = upstream.call(provider.get_quotes, symbols), set()
+    except UpstreamError as e:
+        logger.warning("Could not fetch quotes for %s", e.failed)
+        prices, failed = e.partial, set(e.failed)
+    except Exception:
+        logger.warning("Could not fetch quotes for %s", symbols, exc_info=True)
+        prices, failed = {}, set(symbols)
+    cache = _cache()
+    profiles = cache.get_many([_profile_key(symbol) for symbol in symbols])
+
+    # Expired profiles need a fundamentals call each; fetch them in parallel.
+    expired = [
+        symbol for symbol in symbols
+        if _profile_key(symbol) not in profiles and symbol not in failed
+    ]
+    infos = fetch_concurrently(
+        lambda symbol: upstream.call(provider.get_fundamentals, symbol, ignore=(SymbolNotFound,)),
+        expired,
+    )
+
+    quotes = {}
+    for symbol in symbols:
+        profile = profiles.get(_profile_key(symbol))
+        if profile is None:
+            _record(hit=False)
+            if symbol in infos:
+                quotes[symbol] = store_quote(symbol, {**infos[symbol], **prices.get(symbol, {})})
+            continue
+
+        _record(hit=True)
+        price = prices.get(symbol)
+        if price is None:
+            continue
+        _store_price(cache, symbol, price, profile)
+        quotes[symbol] = {**profile, **price}
+
+    if quotes:
+        _bump_quote_version()
+
+    unfetched = [symbol for symbol in symbols if symbol not in quotes]
+    for symbol in unfetched:
+        if symbol not in prices and symbol not in failed:
+            # Upstream answered but had no price for it.
+            _remember_missing(symbol)
+    quotes.update(_stale_quotes(unfetched))
+    return quotes
+
+
+def _get_executor():
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(
+                max_workers=settings.MARKET_DATA_MAX_WORKERS,
+                thread_name_prefix="market-data",
+            )
+        return _executor
+
+
+def fetch_concurrently(func, symbols, timeout=None):
+    """
+    Run ``func(symbol)`` for every symbol on the process-wide bounded pool.
+
+    The caller waits at most ``timeout`` seconds (``MARKET_DATA_FETCH_TIMEOUT``
+    by default) per wave of workers, since symbols beyond the pool size
+    queue behind the first ones. This is one overall deadline, not a limit
+    on each call: when it passes, calls still queued are cancelled, but a
+    call already running cannot be interrupted and keeps its worker until
+    the provider's own HTTP timeout ends it. Returns ``{symbol: result}``
+    for the calls that succeeded in time; failures and timeouts are logged
+    and left out.
+    """
+    if not symbols:
+        return {}
+    if timeout is None:
+        timeout = settings.MARKET_DATA_FETCH_TIMEOUT
+
+    futures = {_get_executor().submit(func, symbol): symbol for symbol in symbols}
+    waves = math.ceil(len(futures) / settings.MARKET_DATA_MAX_WORKERS)
+    # Worker threads don't share the request's timing context, so the
+    # fan-out is attributed to ``upstream`` as a whole.
+    with timed("upstream", "fan_out"):
+        done, not_done = wait(futures, timeout=timeout * waves)
+
+    for future in not_done:
+        # Only takes effect for calls that have not started yet.
+        future.cancel()
+        # A hung upstream counts against the breaker like an error does.
+        upstream.record_failure()
+        logger.warning("Timed out fetching market data for %s", futures[future])
+
+    results = {}
+    for future in done:
+        symbol = futures[future]
+        try:
+            results[symbol] = future.result()
+        except Exception:
+            logger.warning("Could not fetch market data for %s", symbol, exc_info=True)
+    return results
+
+
+def refresh_quotes(symbols):
+    """
+    Fetch fresh quotes for ``symbols`` regardless of what is cached and write
+    them to the cache. Returns the quotes that could be fetched.
+    """
+    return _fetch_quotes(symbols)
+
+
+def refresh_lag(symbols):
+    """
+    Seconds since each symbol's price was last written to the cache, or
+    ``None`` for symbols that have not been fetched recently.
+    """
+    symbols = sorted({symbol.upper() for symbol in symbols})
+    refreshed = _cache().get_many([_refreshed_key(symbol) for symbol in symbols])
+    now = time.time()
+    lag = {}
+    for symbol in symbols:
+        refreshed_at = refreshed.get(_refreshed_key(symbol))
+        lag[symbol] = round(now - refreshed_at, 3) if refreshed_at is not None else None
+    return lag
+
+
+def cache_stats():
+    """Cache and circuit breaker counters for this process."""
+    with _stats_lock:
+        stats = dict(_stats)
+    total = stats["hits"] + stats["misses"]
+    return {
+        "hits": stats["hits"],
+        "misses": stats["misses"],
+        "hitRatio": round(stats["hits"] / total, 4) if total else 0.0,
+        "staleServed": stats["stale"],
+        "negativeHits": stats["negative"],
+        "circuit": {"state": upstream.state, **upstream.counters},
+    }
@@ -1,28 +1,36 @@
 import jwt
+import logging
+import time
 from urllib.parse import parse_qs
 from channels.db import database_sync_to_async
 from django.contrib.auth.models import AnonymousUser
 from channels.middleware import BaseMiddleware
 from django.conf import settings
-from rest_framework_simplejwt.authentication import JWTAuthentication
+from django.db import connection
 from rest_framework.exceptions import AuthenticationFailed
 
+from authapp.authentication import CachedJWTAuthentication
+
+from . import instrumentation
+
+logger = logging.getLogger(__name__)
+
 @database_sync_to_async
 def get_user_from_token(token):
     """
     Validate the JWT token and return the user if valid.
     """
     try:
-        jwt_auth = JWTAuthentication()
+        jwt_auth = CachedJWTAuthentication()
         validated_token = jwt_auth.get_validated_token(token)
         user = jwt_auth.get_user(validated_token)
-        print(f"✅ User authenticated: {user}")  # Debug print
+        logger.debug("WebSocket user authenticated: %s", user.pk)
         return user
     except AuthenticationFailed:
-        print("❌ Authentication failed")
+        logger.info("WebSocket authentication failed")
         return AnonymousUser()
-    except Exception as e:
-        print(f"❌ JWT Error: {e}")
+    except Exception:
+        logger.warning("WebSocket JWT error", exc_info=True)
         return AnonymousUser()
 
 class JWTAuthMiddleware(BaseMiddleware):
@@ -33,10 +41,48 @@ class JWTAuthMiddleware(BaseMiddleware):
 
         if token_list:
             token = token_list[0]
-            print(f"🔍 Received token: {token}")  # Debug print
             scope["user"] = await get_user_from_token(token)  # Authenticate user
         else:
-            print("⚠️ No token found, assigning AnonymousUser")
+            logger.debug("No token in WebSocket query string, assigning AnonymousUser")
             scope["user"] = AnonymousUser()  # Assign anonymous user if no token
 
         return await super().__call__(scope, receive, send)
+
+
+class ServerTimingMiddleware:
+    """
+    Times each HTTP request, split into upstream market data, database,
+    response rendering and the remaining application time. The breakdown is
+    returned in a ``Server-Timing`` header and recorded in the request
+    histograms.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        token = instrumentation.start()
+        started = time.perf_counter()
+        try:
+            with connection.execute_wrapper(instrumentation.db_timer):
+                response = self.get_response(request)
+        finally:
+            timings = instrumentation.finish(token)
+
+        parts = instrumentation.breakdown(timings, time.perf_counter() - started)
+        response["Server-Timing"] = instrumentation.server_timing_header(parts)
+        match = getattr(request, "resolver_match", None)
+        view = match.url_name if match and match.url_name else "unmatched"
+        instrumentation.observe_request(view, parts)
+        return response
+
+    def process_template_response(self, request, response):
+        # DRF responses are rendered after this hook returns; a post-render
+        # callback closes the timer once the body has been produced.
+        started = time.perf_counter()
+
+        def record_render(rendered):
+            instrumentation.add("render", time.perf_counter() - started)
+
+        response.add_post_render_callback(record_render)
+        return response
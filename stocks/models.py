@@ -1,4 +1,5 @@
 from django.db import models
+from django.db.models import Q
 from django.contrib.auth.models import User
 
 class Stock(models.Model):
@@ -10,6 +11,13 @@ class Stock(models.Model):
     sector = models.CharField(max_length=100, blank=True)
     avgPrice = models.DecimalField(max_digits=12, decimal_places=2, default=0.00)
 
+    class Meta:
+        constraints = [
+            # One position per user and symbol; also the index behind the
+            # (user, symbol) lookup when a stock is added.
+            models.UniqueConstraint(fields=['user', 'symbol'], name='unique_stock_user_symbol'),
+        ]
+
     def __str__(self):
         return f"{self.symbol} - {self.name}"
 
@@ -23,13 +31,40 @@ class Alert(models.Model):
     triggerPrice = models.DecimalField(max_digits=12, decimal_places=2)
     triggered = models.BooleanField(default=False) 
 
+    class Meta:
+        indexes = [
+            # Only untriggered alerts are ever matched, and they are a small
+            # share of the table once alerts have been firing for a while.
+            models.Index(fields=['symbol'], name='alert_untriggered_symbol_idx', condition=Q(triggered=False)),
+        ]
+
     def __str__(self):
         return f"Alert for {self.symbol} ({self.type})"
 
 class Watchlist(models.Model):
     user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='watchlists')
     name = models.CharField(max_length=100)
+    # The generated through table is already unique on (watchlist, stock),
+    # which indexes watchlist lookups, and has its own stock index.
     stocks = models.ManyToManyField(Stock, blank=True, related_name='watchlists')
 
     def __str__(self):
         return self.name
+
+class PriceHistory(models.Model):
+    symbol = models.CharField(max_length=10)
+    date = models.DateField()
+    open = models.DecimalField(max_digits=12, decimal_places=4)
+    high = models.DecimalField(max_digits=12, decimal_places=4)
+    low = models.DecimalField(max_digits=12, decimal_places=4)
+    close = models.DecimalField(max_digits=12, decimal_places=4)
+    volume = models.BigIntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            # Also serves as the (symbol, date) index for chart range queries.
+            models.UniqueConstraint(fields=['symbol', 'date'], name='unique_price_history_symbol_date'),
+        ]
+
+    def __str__(self):
+        return f"{self.symbol} {self.date}: {self.close}"
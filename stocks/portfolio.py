@@ -0,0 +1,179 @@
+"""
+Per-user portfolio snapshots for the overall overview.
+
+A snapshot holds the user's positions as parallel NumPy arrays (symbols,
+shares, average prices) in the default cache, so valuing the portfolio is
+one cache read plus a dot product against the current quotes. It is built
+from :class:`Stock` on first use. Positions saved inside
+:func:`updating_positions` are updated in place (``version`` increases with
+every such change); saving or deleting a :class:`Stock` anywhere else drops
+the snapshot instead.
+
+Separately, every user has a version that any change to what their
+overviews show (positions, watchlists, pins, alerts) moves forward; the
+overview ETags are derived from it. Each snapshot records the user version
+it was built at and is rebuilt once that version has moved on.
+"""
+import threading
+import time
+from contextlib import contextmanager
+
+import numpy as np
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from .locks import cache_lock
+from .models import Stock
+
+
+_local = threading.local()
+
+
+def _key(user_id):
+    return f"portfolio:{user_id}"
+
+
+def _version_key(user_id):
+    return f"portfolio:{user_id}:version"
+
+
+def version(user_id):
+    """The user's current version."""
+    key = _version_key(user_id)
+    current = cache.get(key)
+    if current is None:
+        # Start from the clock so a lost counter never repeats an old value.
+        cache.add(key, time.time_ns(), None)
+        current = cache.get(key)
+    return current
+
+
+def touch(user_id):
+    """
+    Move the user's version forward after a change to their data and
+    return the new version.
+    """
+    key = _version_key(user_id)
+    try:
+        return cache.incr(key)
+    except ValueError:
+        cache.add(key, time.time_ns(), None)
+        return cache.get(key)
+
+
+def _build(user_id, user_version):
+    rows = list(
+        Stock.objects.filter(user_id=user_id).order_by("id").values_list("symbol", "shares", "avgPrice")
+    )
+    return {
+        "version": 0,
+        "user_version": user_version,
+        "symbols": [row[0] for row in rows],
+        "shares": np.array([row[1] for row in rows], dtype=np.float64),
+        "avg_prices": np.array([float(row[2]) for row in rows], dtype=np.float64),
+    }
+
+
+def load(user_id):
+    """The user's snapshot, built from the database if it is not cached or stale."""
+    # Read the version before the database: a change that commits while the
+    # snapshot is built moves it on, so the next load rebuilds.
+    current = version(user_id)
+    snapshot = cache.get(_key(user_id))
+    if snapshot is None or snapshot.get("user_version") != current:
+        snapshot = _build(user_id, current)
+        cache.set(_key(user_id), snapshot, settings.PORTFOLIO_SNAPSHOT_TTL)
+    return snapshot
+
+
+def set_position(user_id, symbol, shares, avg_price):
+    """Add or replace the position in ``symbol``."""
+    try:
+        with cache_lock(f"{_key(user_id)}:lock"):
+            snapshot = cache.get(_key(user_id))
+            before = version(user_id)
+            after = touch(user_id)
+            # Only a snapshot that was current, with no other change in
+            # between, can be updated in place; anything else is rebuilt on
+            # the next load.
+            if snapshot is None or snapshot.get("user_version") != before or after != before + 1:
+                cache.delete(_key(user_id))
+                return
+            if symbol in snapshot["symbols"]:
+                i = snapshot["symbols"].index(symbol)
+                snapshot["shares"][i] = shares
+                snapshot["avg_prices"][i] = avg_price
+            else:
+                snapshot["symbols"].append(symbol)
+                snapshot["shares"] = np.append(snapshot["shares"], float(shares))
+                snapshot["avg_prices"] = np.append(snapshot["avg_prices"], float(avg_price))
+            snapshot["version"] += 1
+            snapshot["user_version"] = after
+            cache.set(_key(user_id), snapshot, settings.PORTFOLIO_SNAPSHOT_TTL)
+    except TimeoutError:
+        invalidate(user_id)
+
+
+def invalidate(user_id):
+    """Drop the user's snapshot and move their version forward."""
+    cache.delete(_key(user_id))
+    touch(user_id)
+
+
+@contextmanager
+def updating_positions():
+    """
+    Apply :class:`Stock` saves in the block to the snapshot in place, with
+    :func:`set_position` once they commit, instead of dropping it. Only for
+    saves that change nothing but a position's shares and average price.
+    """
+    _local.updating_positions = True
+    try:
+        yield
+    finally:
+        _local.updating_positions = False
+
+
+@receiver(post_save, sender=Stock)
+def _stock_saved(sender, instance, **kwargs):
+    # After commit, so a rebuild cannot read the rows from before the change.
+    if getattr(_local, "updating_positions", False):
+        position = (instance.user_id, instance.symbol, instance.shares, float(instance.avgPrice))
+        transaction.on_commit(lambda: set_position(*position))
+    else:
+        transaction.on_commit(lambda: invalidate(instance.user_id))
+
+
+@receiver(post_delete, sender=Stock)
+def _stock_deleted(sender, instance, **kwargs):
+    transaction.on_commit(lambda: invalidate(instance.user_id))
+
+
+def price_vector(snapshot, quotes):
+    """
+    Current price per position; NaN where there is no quote, 0.0 where the
+    quote has no usable price.
+    """
+    prices = np.full(len(snapshot["symbols"]), np.nan)
+    for i, symbol in enumerate(snapshot["symbols"]):
+        info = quotes.get(symbol)
+        if info is None:
+            continue
+        try:
+            prices[i] = float(info.get("regularMarketPrice", 0))
+        except (TypeError, ValueError):
+            prices[i] = 0.0
+    return prices
+
+
+def revalue(snapshot, prices):
+    """``(total_value, total_gain_loss)`` over the positions that have a price."""
+    priced = ~np.isnan(prices)
+    shares = snapshot["shares"][priced]
+    current = prices[priced]
+    total_value = float(current @ shares)
+    total_gain_loss = float((current - snapshot["avg_prices"][priced]) @ shares)
+    return total_value, total_gain_loss
@@ -0,0 +1,21 @@
+"""
+Market-data providers.
+
+Everything in the ``stocks`` app reaches market data through the provider
+configured by ``MARKET_DATA_PROVIDER`` (a dotted path), so the live yfinance
+backend can be swapped for the offline replay provider in load tests.
+"""
+from functools import lru_cache
+
+from django.conf import settings
+from django.utils.module_loading import import_string
+
+from .base import MarketDataProvider, SymbolNotFound, UpstreamError, price_from_bars
+
+__all__ = ["MarketDataProvider", "SymbolNotFound", "UpstreamError", "get_provider", "price_from_bars"]
+
+
+@lru_cache(maxsize=None)
+def get_provider():
+    """Return the process-wide provider instance."""
+    return import_string(settings.MARKET_DATA_PROVIDER)()
@@ -0,0 +1,58 @@
+class SymbolNotFound(LookupError):
+    """The provider has no data for the requested symbol."""
+
+
+class UpstreamError(Exception):
+    """
+    A batch request failed for some symbols (rate limit, timeout, network)
+    rather than finding no data for them. ``failed`` lists those symbols;
+    ``partial`` holds the results for the rest.
+    """
+
+    def __init__(self, failed, partial=None):
+        super().__init__(f"Upstream request failed for {', '.join(failed)}")
+        self.failed = list(failed)
+        self.partial = partial if partial is not None else {}
+
+
+class MarketDataProvider:
+    """
+    Interface the ``stocks`` app uses for all market data.
+
+    Quotes and fundamentals are dicts keyed by yfinance ``info`` field names
+    (``regularMarketPrice``, ``longName``, ``marketCap``, ...). History is
+    returned as ``{symbol: DataFrame}`` of daily bars with ``Open``, ``High``,
+    ``Low``, ``Close`` and ``Volume`` columns, indexed by date; symbols with
+    no data are left out. Batch methods raise :class:`UpstreamError` when
+    symbols could not be fetched at all.
+    """
+
+    def get_quote(self, symbol):
+        """Price and profile fields for one symbol."""
+        raise NotImplementedError
+
+    def get_quotes(self, symbols):
+        """``{symbol: price fields}`` for many symbols in one round trip."""
+        raise NotImplementedError
+
+    def get_history(self, symbols, period=None, start=None, interval="1d"):
+        """Bars for many symbols, for a ``period`` or from ``start`` onwards."""
+        raise NotImplementedError
+
+    def get_fundamentals(self, symbol):
+        """Profile fields (name, sector, market cap, dividends) for one symbol."""
+        raise NotImplementedError
+
+
+def price_from_bars(bars):
+    """Derive quote price fields from the last two bars of a history frame."""
+    closes = bars["Close"]
+    last = float(closes.iloc[-1])
+    previous = float(closes.iloc[-2]) if len(closes) > 1 else last
+    price = {
+        "regularMarketPrice": last,
+        "regularMarketChange": last - previous,
+    }
+    if "Volume" in bars.columns and bars["Volume"].notna().iloc[-1]:
+        price["regularMarketVolume"] = int(bars["Volume"].iloc[-1])
+    return price
@@ -0,0 +1,104 @@
+"""
+Offline provider that replays recorded market data from disk.
+
+Fixtures live under ``MARKET_DATA_REPLAY_DIR``::
+
+    quotes/<SYMBOL>.json    the yfinance ``info`` dict for the symbol
+    history/<SYMBOL>.csv    daily bars: Date,Open,High,Low,Close,Volume
+
+``record_market_data`` writes them from the live provider. Bars are shifted
+so the last recorded bar falls on today, which keeps date-based syncing and
+charting working while the prices themselves stay the same on every run.
+"""
+import json
+import re
+import threading
+from pathlib import Path
+
+import pandas as pd
+from django.conf import settings
+from django.utils import timezone
+
+from .base import MarketDataProvider, SymbolNotFound, price_from_bars
+
+_PERIOD = re.compile(r"^(\d+)(d|wk|mo|y)$")
+_PERIOD_UNITS = {"d": "days", "wk": "weeks", "mo": "months", "y": "years"}
+_RESAMPLE = {"1wk": "W-FRI", "1mo": "ME"}
+
+
+def period_start(end, period):
+    """The first date covered by a yfinance-style ``period`` ending at ``end``."""
+    if period in (None, "max"):
+        return None
+    if period == "ytd":
+        return end.replace(month=1, day=1)
+    match = _PERIOD.match(period)
+    if match is None:
+        raise ValueError(f"Unsupported period: {period}")
+    count, unit = int(match.group(1)), _PERIOD_UNITS[match.group(2)]
+    return end - pd.DateOffset(**{unit: count})
+
+
+class ReplayProvider(MarketDataProvider):
+    def __init__(self, root=None):
+        self.root = Path(root or settings.MARKET_DATA_REPLAY_DIR)
+        self._lock = threading.Lock()
+        self._quotes = {}
+        self._history = {}
+
+    def _load_quote(self, symbol):
+        with self._lock:
+            if symbol not in self._quotes:
+                path = self.root / "quotes" / f"{symbol}.json"
+                self._quotes[symbol] = json.loads(path.read_text()) if path.exists() else None
+            return self._quotes[symbol]
+
+    def _load_history(self, symbol):
+        with self._lock:
+            if symbol not in self._history:
+                path = self.root / "history" / f"{symbol}.csv"
+                frame = None
+                if path.exists():
+                    frame = pd.read_csv(path, index_col="Date", parse_dates=True)
+                    if not frame.empty:
+                        today = pd.Timestamp(timezone.localdate())
+                        frame.index = frame.index + (today - frame.index[-1])
+                self._history[symbol] = frame
+            return self._history[symbol]
+
+    def get_fundamentals(self, symbol):
+        info = self._load_quote(symbol.upper())
+        if info is None:
+            raise SymbolNotFound(symbol)
+        return dict(info)
+
+    def get_quote(self, symbol):
+        info = self.get_fundamentals(symbol)
+        bars = self._load_history(symbol.upper())
+        if bars is not None and not bars.empty:
+            info.update(price_from_bars(bars))
+        return info
+
+    def get_quotes(self, symbols):
+        bars = self.get_history(symbols, period="5d")
+        return {symbol: price_from_bars(frame) for symbol, frame in bars.items()}
+
+    def get_history(self, symbols, period=None, start=None, interval="1d"):
+        bars = {}
+        for symbol in symbols:
+            frame = self._load_history(symbol.upper())
+            if frame is None or frame.empty:
+                continue
+            if start is not None:
+                frame = frame[frame.index >= pd.Timestamp(start)]
+            else:
+                first = period_start(frame.index[-1], period)
+                if first is not None:
+                    frame = frame[frame.index > first]
+            if interval in _RESAMPLE:
+                frame = frame.resample(_RESAMPLE[interval]).agg({
+                    "Open": "first", "High": "max", "Low": "min", "Close": "last", "Volume": "sum",
+                }).dropna(subset=["Close"])
+            if not frame.empty:
+                bars[symbol] = frame
+        return bars
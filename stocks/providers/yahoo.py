@@ -0,0 +1,143 @@
+import threading
+
+import requests
+import yfinance as yf
+from django.conf import settings
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+from yfinance.exceptions import (
+    YFInvalidPeriodError,
+    YFPricesMissingError,
+    YFTickerMissingError,
+    YFTzMissingError,
+)
+
+from ..instrumentation import timed
+from .base import MarketDataProvider, SymbolNotFound, UpstreamError, price_from_bars
+
+# yf.download never raises; it records ``repr(error)`` per failed ticker.
+# These errors mean upstream answered without data for the ticker.
+_NO_DATA_ERRORS = tuple(
+    f"{error.__name__}("
+    for error in (YFTickerMissingError, YFTzMissingError, YFPricesMissingError, YFInvalidPeriodError)
+)
+
+
+class _TimeoutAdapter(HTTPAdapter):
+    """Caps the timeout of every request sent through it, whatever the caller asked for."""
+
+    def __init__(self, timeout, **kwargs):
+        self.timeout = timeout
+        super().__init__(**kwargs)
+
+    def _cap(self, timeout):
+        return self.timeout if timeout is None else min(timeout, self.timeout)
+
+    def send(self, request, timeout=None, **kwargs):
+        # ``timeout`` may be a (connect, read) pair.
+        if isinstance(timeout, tuple):
+            timeout = tuple(self._cap(part) for part in timeout)
+        else:
+            timeout = self._cap(timeout)
+        return super().send(request, timeout=timeout, **kwargs)
+
+
+# yf.download collects results and per-ticker errors in module globals
+# (``yf.shared._DFS`` / ``_ERRORS``) that every call rebinds, so two
+# downloads in one process (gthread workers, a threaded Celery pool) could
+# see or wipe each other's errors and let a failed ticker pass as "no data".
+# Downloads are serialised with this lock, held until the errors are read.
+_download_lock = threading.Lock()
+
+# Fields ``Ticker.info`` always has for a symbol Yahoo knows.
+_QUOTE_FIELDS = ("quoteType", "regularMarketPrice")
+
+
+def _prices(bars):
+    return {symbol: price_from_bars(frame) for symbol, frame in bars.items()}
+
+
+class YahooFinanceProvider(MarketDataProvider):
+    """
+    Live data from yfinance over one pooled ``requests.Session``, so
+    concurrent fetches reuse keep-alive connections instead of paying a TLS
+    handshake per call. Every request on it times out after
+    ``MARKET_DATA_HTTP_TIMEOUT`` seconds, which is what bounds a call that
+    :func:`stocks.market_data.fetch_concurrently` has already started.
+    """
+
+    def __init__(self):
+        adapter = _TimeoutAdapter(
+            settings.MARKET_DATA_HTTP_TIMEOUT,
+            pool_connections=settings.MARKET_DATA_HTTP_POOL_SIZE,
+            pool_maxsize=settings.MARKET_DATA_HTTP_POOL_SIZE,
+            max_retries=Retry(total=2, backoff_factor=0.3, status_forcelist=(502, 503, 504)),
+        )
+        self.session = requests.Session()
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+        self.session.hooks["response"].append(self._record_status)
+        self._local = threading.local()
+
+    def _record_status(self, response, *args, **kwargs):
+        if "/quoteSummary/" in response.url:
+            self._local.quote_summary_status = response.status_code
+
+    def get_quote(self, symbol):
+        self._local.quote_summary_status = None
+        try:
+            with timed("upstream", "info"):
+                info = yf.Ticker(symbol, session=self.session).info
+        except (AttributeError, TypeError):
+            # yfinance logs and swallows the quoteSummary HTTP error, then
+            # fails on the missing result; only a 404 means no such symbol.
+            if self._local.quote_summary_status == 404:
+                raise SymbolNotFound(symbol) from None
+            raise
+        if not info or not any(info.get(field) is not None for field in _QUOTE_FIELDS):
+            raise SymbolNotFound(symbol)
+        return info
+
+    def get_fundamentals(self, symbol):
+        # yfinance serves price and profile fields from the same endpoint.
+        return self.get_quote(symbol)
+
+    def get_quotes(self, symbols):
+        try:
+            bars = self.get_history(symbols, period="5d")
+        except UpstreamError as e:
+            raise UpstreamError(e.failed, _prices(e.partial)) from e
+        return _prices(bars)
+
+    def get_history(self, symbols, period=None, start=None, interval="1d"):
+        symbols = list(symbols)
+        with _download_lock, timed("upstream", "download"):
+            frame = yf.download(
+                symbols,
+                period=period,
+                start=start,
+                interval=interval,
+                group_by="ticker",
+                auto_adjust=False,
+                progress=False,
+                session=self.session,
+            )
+            errors = dict(yf.shared._ERRORS)
+        failed = [
+            symbol for symbol in symbols
+            if symbol.upper() in errors and not errors[symbol.upper()].startswith(_NO_DATA_ERRORS)
+        ]
+        bars = {}
+        if frame is not None and not frame.empty:
+            for symbol in symbols:
+                if symbol in failed:
+                    continue
+                try:
+                    symbol_frame = frame[symbol].dropna(subset=["Close"])
+                except KeyError:
+                    continue
+                if not symbol_frame.empty:
+                    bars[symbol] = symbol_frame
+        if failed:
+            raise UpstreamError(failed, bars)
+        return bars
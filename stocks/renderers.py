@@ -0,0 +1,43 @@
+"""
+Renderers for the time-series endpoints.
+
+Chart series are built as parallel ``dates``/``prices`` arrays. Plain JSON
+clients get them expanded into the ``[{"date", "price"}]`` rows they have
+always received. Clients that ask for the columnar JSON or MessagePack
+media types (``Accept`` header, or ``?format=columnar`` / ``?format=msgpack``)
+get the arrays as they are, without a dict per point.
+"""
+import msgpack
+from rest_framework.renderers import BaseRenderer, JSONRenderer
+from rest_framework.settings import api_settings
+from rest_framework.utils.encoders import JSONEncoder
+
+
+class ColumnarJSONRenderer(JSONRenderer):
+    media_type = "application/vnd.stockanalysis.columnar+json"
+    format = "columnar"
+    columnar = True
+
+
+class MessagePackRenderer(BaseRenderer):
+    media_type = "application/msgpack"
+    format = "msgpack"
+    charset = None
+    render_style = "binary"
+    columnar = True
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b""
+        # Decimals, dates and the like encode as they do in JSON.
+        return msgpack.packb(data, default=JSONEncoder().default)
+
+
+SERIES_RENDERERS = [*api_settings.DEFAULT_RENDERER_CLASSES, ColumnarJSONRenderer, MessagePackRenderer]
+
+
+def present_series(request, series):
+    """``series`` in the shape the negotiated renderer sends."""
+    if getattr(request.accepted_renderer, "columnar", False):
+        return series
+    return [{"date": date, "price": price} for date, price in zip(series["dates"], series["prices"])]
@@ -7,7 +7,16 @@ class StockSerializer(serializers.ModelSerializer):
         fields = ['id', 'symbol', 'name', 'is_pinned', 'shares', 'sector', 'avgPrice']
         read_only_fields = ['id']
 
-class WatchlistSerializer(serializers.ModelSerializer):
+class DynamicFieldsModelSerializer(serializers.ModelSerializer):
+    """Takes an optional ``fields`` argument limiting the serialized fields."""
+
+    def __init__(self, *args, fields=None, **kwargs):
+        super().__init__(*args, **kwargs)
+        if fields is not None:
+            for name in set(self.fields) - set(fields):
+                self.fields.pop(name)
+
+class WatchlistSerializer(DynamicFieldsModelSerializer):
     # Nested stock serializer; stocks will be read-only here.
     stocks = StockSerializer(many=True, read_only=True)
 
@@ -0,0 +1,133 @@
+"""
+Price subscriptions shared by every Daphne process.
+
+Each open :class:`stocks.consumers.PriceConsumer` records itself as a
+watcher of every symbol it subscribes to, with an expiry it pushes forward
+while the connection lives; the ``broadcast_prices`` task only fetches
+symbols that still have an unexpired watcher. A process that dies without
+disconnecting its clients stops refreshing them, so their entries lapse
+after ``PRICE_STREAM_SUBSCRIPTION_TTL`` seconds.
+
+With Redis each symbol's watchers are a sorted set of channel names scored
+by expiry, and a second sorted set indexes the watched symbols by their
+latest expiry. Every update touches only the symbols it names, and nothing
+takes a shared lock. Without Redis the default cache is process-local, and
+so are the subscriptions.
+"""
+import re
+import threading
+import time
+from collections import defaultdict
+
+from django.conf import settings
+from django.core.cache import caches
+from django.core.cache.backends.redis import RedisCache
+
+SYMBOLS_KEY = "prices:subscriptions"
+
+# Channel-layer group names only allow ASCII letters, digits, "-", "_" and ".".
+SYMBOL_PATTERN = re.compile(r"^[A-Z0-9.\-]{1,15}$")
+
+
+def group_name(symbol):
+    return f"prices_{symbol}"
+
+
+def _watchers_key(symbol):
+    return f"prices:subscriptions:{symbol}"
+
+
+class _RedisRegistry:
+    def __init__(self, cache):
+        self.cache = cache
+
+    def _pipeline(self):
+        # The cache API has no sorted sets; use its client, and its key
+        # prefixing, directly.
+        return self.cache._cache.get_client(write=True).pipeline(transaction=False)
+
+    def add(self, channel_name, symbols, expires, ttl):
+        pipe = self._pipeline()
+        for symbol in symbols:
+            key = self.cache.make_key(_watchers_key(symbol))
+            pipe.zadd(key, {channel_name: expires})
+            pipe.expire(key, ttl)
+        index = self.cache.make_key(SYMBOLS_KEY)
+        pipe.zadd(index, {symbol: expires for symbol in symbols})
+        pipe.expire(index, ttl)
+        pipe.execute()
+
+    def remove(self, channel_name, symbols):
+        pipe = self._pipeline()
+        for symbol in symbols:
+            pipe.zrem(self.cache.make_key(_watchers_key(symbol)), channel_name)
+        pipe.execute()
+
+    def active(self, now):
+        index = self.cache.make_key(SYMBOLS_KEY)
+        client = self.cache._cache.get_client(write=True)
+        client.zremrangebyscore(index, "-inf", now)
+        candidates = [symbol.decode() for symbol in client.zrangebyscore(index, now, "+inf")]
+        # The index still lists symbols whose last watcher unsubscribed
+        # since; count each one's live watchers.
+        pipe = client.pipeline(transaction=False)
+        for symbol in candidates:
+            pipe.zcount(self.cache.make_key(_watchers_key(symbol)), now, "+inf")
+        return [symbol for symbol, watchers in zip(candidates, pipe.execute()) if watchers]
+
+
+class _LocalRegistry:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.watchers = defaultdict(dict)
+
+    def add(self, channel_name, symbols, expires, ttl):
+        with self.lock:
+            for symbol in symbols:
+                self.watchers[symbol][channel_name] = expires
+
+    def remove(self, channel_name, symbols):
+        with self.lock:
+            for symbol in symbols:
+                self.watchers[symbol].pop(channel_name, None)
+
+    def active(self, now):
+        with self.lock:
+            for symbol, channels in list(self.watchers.items()):
+                live = {name: expires for name, expires in channels.items() if expires > now}
+                if live:
+                    self.watchers[symbol] = live
+                else:
+                    del self.watchers[symbol]
+            return list(self.watchers)
+
+
+_local_registry = _LocalRegistry()
+
+
+def _registry():
+    cache = caches["default"]
+    if isinstance(cache, RedisCache):
+        return _RedisRegistry(cache)
+    return _local_registry
+
+
+def subscribe(channel_name, symbols):
+    """
+    Record ``channel_name`` as watching ``symbols`` for the next
+    ``PRICE_STREAM_SUBSCRIPTION_TTL`` seconds. Connections call it again
+    with everything they watch to refresh.
+    """
+    if symbols:
+        ttl = settings.PRICE_STREAM_SUBSCRIPTION_TTL
+        _registry().add(channel_name, sorted(symbols), time.time() + ttl, ttl)
+
+
+def unsubscribe(channel_name, symbols):
+    if symbols:
+        _registry().remove(channel_name, sorted(symbols))
+
+
+def active_symbols():
+    """Symbols at least one connected client is watching."""
+    return sorted(_registry().active(time.time()))
@@ -0,0 +1,123 @@
+"""
+In-process symbol/name index for search-box autocomplete.
+
+Loaded once per process from ``SYMBOL_LISTING_FILE`` (a ``symbol,name``
+CSV; the bundled ``stocks/data/symbols.csv`` lists the constituents of the
+major US and European indices and the Nikkei 225, derived from
+pytickersymbols under the MIT license in ``LICENSE.pytickersymbols``
+beside it). Lookups are binary searches over sorted lists of symbols and
+of lower-cased name words, with a fuzzy word match as the fallback when
+nothing matches by prefix. Nothing here touches the network.
+"""
+import csv
+import difflib
+import re
+import threading
+from bisect import bisect_left
+
+from django.conf import settings
+
+from .models import Stock
+
+_WORD = re.compile(r"[a-z0-9]+")
+
+_lock = threading.Lock()
+_index = None
+
+
+class SymbolIndex:
+    def __init__(self, rows):
+        rows = sorted({symbol.upper(): name for symbol, name in rows}.items())
+        self.symbols = [symbol for symbol, _ in rows]
+        self.names = [name for _, name in rows]
+        self.sort_names = [name.lower() for name in self.names]
+
+        # (word, row) pairs for every word of every name, sorted by word.
+        words = sorted(
+            (word, row)
+            for row, name in enumerate(self.names)
+            for word in set(_WORD.findall(name.lower()))
+        )
+        self.words = [word for word, _ in words]
+        self.word_rows = [row for _, row in words]
+        self.vocabulary = sorted(set(self.words))
+
+    @classmethod
+    def from_csv(cls, path):
+        # Listings too long to store as a position could be suggested but
+        # never added.
+        max_length = Stock._meta.get_field("symbol").max_length
+        with open(path, newline="", encoding="utf-8") as listing:
+            rows = ((row["symbol"].strip(), row["name"].strip()) for row in csv.DictReader(listing))
+            return cls((symbol, name) for symbol, name in rows if 0 < len(symbol) <= max_length)
+
+    def _prefix_range(self, keys, prefix):
+        # Every key starting with ``prefix`` sorts between it and prefix + U+FFFF.
+        return bisect_left(keys, prefix), bisect_left(keys, prefix + "￿")
+
+    def _word_matches(self, words):
+        """Rows whose name has a word starting with each of ``words``."""
+        matched = None
+        for word in words:
+            start, end = self._prefix_range(self.words, word)
+            rows = set(self.word_rows[start:end])
+            matched = rows if matched is None else matched & rows
+            if not matched:
+                break
+        return matched or set()
+
+    def search(self, query, limit=10):
+        """
+        Up to ``limit`` ``{"symbol", "name"}`` matches: the exact symbol,
+        then symbol prefixes (shortest first), then names whose words start
+        with the query's words; only when none of those match, names with a
+        word close to the last one typed.
+        """
+        query = query.strip()
+        if not query:
+            return []
+        ranked = []
+        seen = set()
+
+        def take(rows):
+            for row in rows:
+                if row not in seen:
+                    seen.add(row)
+                    ranked.append(row)
+
+        start, end = self._prefix_range(self.symbols, query.upper())
+        take(sorted(range(start, end), key=lambda row: (len(self.symbols[row]), self.symbols[row])))
+
+        words = _WORD.findall(query.lower())
+        if words and len(ranked) < limit:
+            # Names that start with the query rank above those that merely
+            # contain its words.
+            lowered = query.lower()
+            take(sorted(
+                self._word_matches(words),
+                key=lambda row: (not self.sort_names[row].startswith(lowered), self.sort_names[row]),
+            ))
+
+        if words and not ranked:
+            # Nothing matched by prefix: tolerate a typo in the last word,
+            # comparing only against words with the same first letter.
+            start, end = self._prefix_range(self.vocabulary, words[-1][0])
+            close = difflib.get_close_matches(words[-1], self.vocabulary[start:end], n=limit, cutoff=0.75)
+            fuzzy = {row for word in close for row in self._word_matches(words[:-1] + [word])}
+            take(sorted(fuzzy, key=self.sort_names.__getitem__))
+
+        return [{"symbol": self.symbols[row], "name": self.names[row]} for row in ranked[:limit]]
+
+
+def get_index():
+    """The process-wide index, loaded on first use."""
+    global _index
+    if _index is None:
+        with _lock:
+            if _index is None:
+                _index = SymbolIndex.from_csv(settings.SYMBOL_LISTING_FILE)
+    return _index
+
+
+def search(query, limit=10):
+    return get_index().search(query, limit)
@@ -1,65 +1,222 @@
-import yfinance as yf
+import logging
+
 from celery import shared_task
-from django.core.mail import send_mail
+from celery.signals import worker_ready
 from django.conf import settings
+from django.core.cache import cache
+from django.core.mail import EmailMessage, get_connection
+from django.db import transaction
 from channels.layers import get_channel_layer
 from asgiref.sync import async_to_sync
-from datetime import timezone
-from .models import Alert
+from . import alert_index, history, market_data, subscriptions
+from .instrumentation import timed
+from .models import Alert, Stock
 
-@shared_task
-def check_stock_alerts():
-    # Get all alerts that haven't been triggered.
-    alerts = Alert.objects.filter(triggered=False)
-    for alert in alerts:
-        # Use yfinance to fetch the latest price for the stock.
-        ticker = yf.Ticker(alert.symbol)
+logger = logging.getLogger(__name__)
+
+
+@worker_ready.connect
+def _rebuild_alert_index(**kwargs):
+    alert_index.rebuild()
+
+
+def _alert_email(alert, current_price):
+    user = alert.stock.user
+    subject = f"Alert Triggered for {alert.symbol} - Condition: {alert.type.capitalize()}"
+    message = (
+        f"Hello {user.first_name or user.username},\n\n"
+        f"Your alert for {alert.symbol} has been triggered at {alert.timestamp.strftime('%Y-%m-%d %H:%M:%S')}.\n\n"
+        f"**Alert Details:**\n"
+        f"  - **Type:** {alert.type.capitalize()} (Trigger Price: {float(alert.triggerPrice):.2f})\n"
+        f"  - **Current Price:** {current_price:.2f}\n"
+        f"  - **Severity:** {alert.severity}\n\n"
+        f"**Additional Message:**\n"
+        f"{alert.message}\n\n"
+        f"Please log in to your account to view more details and manage your alerts.\n\n"
+        f"Thank you,\n"
+        f"SStockSense Team"
+    )
+    return EmailMessage(subject, message, settings.DEFAULT_FROM_EMAIL, [user.email])
+
+
+SENDING, SENT = "sending", "sent"
+
+
+class NotificationInFlight(Exception):
+    """Another attempt is still sending these notifications; retry later."""
+
+
+def _notified_key(channel, alert_id):
+    return f"alerts:notified:{channel}:{alert_id}"
+
+
+def _claim(channel, alert_id):
+    """
+    Take the idempotency key for notifying ``alert_id`` on ``channel`` for
+    the next ``ALERT_NOTIFICATION_CLAIM_TTL`` seconds. False means another
+    attempt already sent (or is sending) it.
+    """
+    return cache.add(_notified_key(channel, alert_id), SENDING, settings.ALERT_NOTIFICATION_CLAIM_TTL)
+
+
+def _was_sent(channel, alert_id):
+    return cache.get(_notified_key(channel, alert_id)) == SENT
+
+
+def _mark_sent(channel, alert_ids):
+    cache.set_many(
+        {_notified_key(channel, alert_id): SENT for alert_id in alert_ids},
+        settings.ALERT_NOTIFICATION_DEDUP_TTL,
+    )
+
+
+def _release(channel, alert_id):
+    cache.delete(_notified_key(channel, alert_id))
+
+
+def _retry_in_flight(task, alert_ids):
+    # The other attempt may have died holding its claims, so wait until they
+    # could have lapsed; the backoff schedule gives up long before that.
+    raise task.retry(exc=NotificationInFlight(alert_ids), countdown=settings.ALERT_NOTIFICATION_CLAIM_TTL)
+
+
+# Delivery runs on its own queues (see CELERY_TASK_ROUTES) so slow SMTP or
+# channel-layer calls never hold up alert evaluation. Jobs are retried with
+# exponential backoff; the per-alert idempotency keys make a retry skip
+# whatever an earlier attempt already delivered. Notifications another
+# attempt is still sending are retried after the claim TTL instead.
+DELIVERY_OPTIONS = {
+    "autoretry_for": (Exception,),
+    "retry_backoff": True,
+    "retry_backoff_max": 300,
+    "retry_jitter": True,
+    "max_retries": 5,
+    "acks_late": True,
+}
+
+
+@shared_task(bind=True, **DELIVERY_OPTIONS)
+def deliver_alert_emails(self, triggered):
+    """
+    Email a batch of ``[alert_id, current_price]`` pairs over one SMTP
+    connection.
+    """
+    prices = dict(triggered)
+    alerts = Alert.objects.filter(id__in=prices).select_related("stock__user")
+    messages = {alert.id: _alert_email(alert, prices[alert.id]) for alert in alerts}
+    if not messages:
+        return 0
+
+    sent, in_flight = 0, []
+    connection = get_connection()
+    with timed("email", "send_batch"):
+        connection.open()
         try:
-            info = ticker.info
-        except Exception:
-            continue  # Skip if we can't get info
+            for alert_id, message in messages.items():
+                if not _claim("email", alert_id):
+                    if not _was_sent("email", alert_id):
+                        in_flight.append(alert_id)
+                    continue
+                try:
+                    sent += connection.send_messages([message])
+                except Exception:
+                    _release("email", alert_id)
+                    raise
+                _mark_sent("email", [alert_id])
+        finally:
+            connection.close()
+    if in_flight:
+        _retry_in_flight(self, in_flight)
+    return sent
+
+
+async def _send_alert_batches(channel_layer, batches):
+    for user_id, alerts in batches.items():
+        await channel_layer.group_send(
+            f"user_{user_id}",
+            {
+                "type": "send_alerts",
+                "alerts": alerts,
+            }
+        )
 
-        current_price = info.get("regularMarketPrice")
-        if current_price is None:
-            continue
 
+@shared_task(bind=True, **DELIVERY_OPTIONS)
+def deliver_alert_updates(self, updates):
+    """
+    Push a run's triggered alerts to the frontend: ``updates`` maps each
+    user id to ``[[alert_id, alert_data], ...]``, and every user gets them
+    as one ``send_alerts`` message.
+    """
+    claimed, in_flight, batches = [], [], {}
+    for user_id, alerts in updates.items():
+        for alert_id, alert_data in alerts:
+            if _claim("websocket", alert_id):
+                claimed.append(alert_id)
+                batches.setdefault(user_id, []).append(alert_data)
+            elif not _was_sent("websocket", alert_id):
+                in_flight.append(alert_id)
+    if batches:
         try:
-            current_price = float(current_price)
+            with timed("websocket", "group_send"):
+                async_to_sync(_send_alert_batches)(get_channel_layer(), batches)
         except Exception:
-            continue
-
-        # Determine if the alert condition is met.
-        condition_met = False
-        if alert.type.lower() == "above" and current_price >= float(alert.triggerPrice):
-            condition_met = True
-        elif alert.type.lower() == "below" and current_price <= float(alert.triggerPrice):
-            condition_met = True
-
-        if condition_met:
-            alert.triggered = True  
-            alert.last_triggered = timezone.now()  # Store last triggered time
-            alert.save()
-
-            # Send an email notification.
-            subject = f"Alert Triggered for {alert.symbol} - Condition: {alert.type.capitalize()}"
-            message = (
-                f"Hello {alert.stock.user.first_name or alert.stock.user.username},\n\n"
-                f"Your alert for {alert.symbol} has been triggered at {alert.timestamp.strftime('%Y-%m-%d %H:%M:%S')}.\n\n"
-                f"**Alert Details:**\n"
-                f"  - **Type:** {alert.type.capitalize()} (Trigger Price: {float(alert.triggerPrice):.2f})\n"
-                f"  - **Current Price:** {current_price:.2f}\n"
-                f"  - **Severity:** {alert.severity}\n\n"
-                f"**Additional Message:**\n"
-                f"{alert.message}\n\n"
-                f"Please log in to your account to view more details and manage your alerts.\n\n"
-                f"Thank you,\n"
-                f"SStockSense Team"
+            for alert_id in claimed:
+                _release("websocket", alert_id)
+            raise
+        _mark_sent("websocket", claimed)
+    if in_flight:
+        _retry_in_flight(self, in_flight)
+    return len(claimed)
+
+
+@shared_task
+def check_stock_alerts():
+    # Only symbols with untriggered alerts are in the index.
+    symbols = alert_index.symbols()
+    if not symbols:
+        return
+
+    # Fetch each distinct symbol once, however many alerts share it.
+    quotes = market_data.get_quotes(symbols)
+    prices = {}
+    for symbol in symbols:
+        try:
+            prices[symbol] = float(quotes[symbol]["regularMarketPrice"])
+        except (KeyError, TypeError, ValueError):
+            continue  # Skip symbols we can't price
+
+    # One binary search per symbol returns exactly the crossed alerts.
+    crossed = alert_index.match(prices)
+    if not crossed:
+        return
+    triggered_prices = {
+        alert_id: prices[symbol] for symbol, alert_ids in crossed.items() for alert_id in alert_ids
+    }
+
+    # Mark every triggered alert in one statement. Locking the rows keeps an
+    # overlapping run from notifying for the same alerts twice.
+    with transaction.atomic():
+        alerts = list(
+            Alert.objects.filter(id__in=triggered_prices, triggered=False)
+            .select_related("stock")
+            .select_for_update(of=("self",), skip_locked=True)
+        )
+        for alert in alerts:
+            alert.triggered = True
+        Alert.objects.bulk_update(alerts, ["triggered"], batch_size=1000)
+
+    # Hand delivery off to the notification queues.
+    with timed("queue", "enqueue_notifications"):
+        batch_size = settings.ALERT_EMAIL_BATCH_SIZE
+        for start in range(0, len(alerts), batch_size):
+            deliver_alert_emails.delay(
+                [[alert.id, triggered_prices[alert.id]] for alert in alerts[start:start + batch_size]]
             )
-            recipient_list = [alert.stock.user.email]
-            send_mail(subject, message, settings.DEFAULT_FROM_EMAIL, recipient_list)
 
-            # Send a real-time update to the frontend via Django Channels.
-            channel_layer = get_channel_layer()
+        # One WebSocket message per user, however many of their alerts fired.
+        updates = {}
+        for alert in alerts:
             alert_data = {
                 "symbol": alert.symbol,
                 "type": alert.type,
@@ -67,13 +224,71 @@ def check_stock_alerts():
                 "severity": alert.severity,
                 "timestamp": alert.timestamp.isoformat(),
                 "triggerPrice": float(alert.triggerPrice),
-                "currentPrice": current_price,
+                "currentPrice": triggered_prices[alert.id],
             }
-            # Assume you have a group per user named "user_{user_id}"
-            async_to_sync(channel_layer.group_send)(
-                f"user_{alert.stock.user.id}",
-                {
-                    "type": "send_alert",
-                    "alert": alert_data,
-                }
-            )
\ No newline at end of file
+            updates.setdefault(alert.stock.user_id, []).append([alert.id, alert_data])
+        if updates:
+            deliver_alert_updates.delay(updates)
+
+    # Drop everything matched, including IDs of alerts deleted along with
+    # their stock, so the next run starts from the remaining alerts.
+    alert_index.remove(crossed)
+
+
+@shared_task
+def sync_price_history():
+    # Append only the daily bars each held symbol is missing.
+    symbols = Stock.objects.values_list("symbol", flat=True).distinct()
+    return history.sync(symbols)
+
+
+@shared_task
+def warm_quote_cache():
+    # Refresh every symbol any user holds so interactive endpoints hit warm
+    # quotes instead of paying the upstream latency themselves.
+    symbols = sorted(Stock.objects.values_list("symbol", flat=True).distinct())
+    batch_size = settings.MARKET_DATA_WARM_BATCH_SIZE
+    refreshed = 0
+    for start in range(0, len(symbols), batch_size):
+        batch = symbols[start:start + batch_size]
+        try:
+            refreshed += len(market_data.refresh_quotes(batch))
+        except Exception:
+            logger.warning("Could not warm quotes for %s", batch, exc_info=True)
+
+    lag = [seconds for seconds in market_data.refresh_lag(symbols).values() if seconds is not None]
+    logger.info(
+        "Warmed %d/%d symbols; max refresh lag %.1fs",
+        refreshed, len(symbols), max(lag, default=0.0),
+    )
+    return refreshed
+
+
+async def _broadcast(channel_layer, quotes):
+    for symbol, quote in quotes.items():
+        await channel_layer.group_send(
+            subscriptions.group_name(symbol),
+            {"type": "price_update", "quote": quote},
+        )
+
+
+@shared_task
+def broadcast_prices():
+    # Fetch each symbol some client is streaming once, then fan the quote
+    # out to that symbol's group.
+    symbols = subscriptions.active_symbols()
+    if not symbols:
+        return 0
+    quotes = market_data.refresh_quotes(symbols)
+    payload = {
+        symbol: {
+            "symbol": symbol,
+            "price": quote.get("regularMarketPrice"),
+            "change": quote.get("regularMarketChange", 0.0),
+            "volume": quote.get("regularMarketVolume", 0),
+        }
+        for symbol, quote in quotes.items()
+    }
+    with timed("websocket", "price_broadcast"):
+        async_to_sync(_broadcast)(get_channel_layer(), payload)
+    return len(payload)
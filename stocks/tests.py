@@ -0,0 +1,335 @@
+import time
+from datetime import timedelta
+from unittest import mock
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core import mail
+from django.core.cache import cache, caches
+from django.test import TestCase, override_settings
+from django.utils import timezone
+from requests import HTTPError, Response
+from requests.adapters import BaseAdapter
+from rest_framework.test import APIClient
+
+from . import history, market_data, portfolio, subscriptions, tasks
+from .circuit_breaker import CLOSED
+from .locks import cache_lock
+from .models import Alert, PriceHistory, Stock, Watchlist
+from .providers.yahoo import YahooFinanceProvider
+from .symbol_index import SymbolIndex
+from .tasks import check_stock_alerts, deliver_alert_emails
+
+SIZES = (2, 20)
+
+
+def fake_quotes(symbols):
+    return {
+        symbol: {"symbol": symbol, "longName": symbol, "regularMarketPrice": 100.0, "regularMarketChange": 1.0}
+        for symbol in symbols
+    }
+
+
+class QueryBudgetTests(TestCase):
+    """
+    Every endpoint runs a fixed number of queries, however many stocks the
+    portfolio holds. Market data is patched out, so no test goes upstream.
+    """
+
+    def setUp(self):
+        cache.clear()
+        caches[settings.MARKET_DATA_CACHE_ALIAS].clear()
+        patcher = mock.patch.object(market_data, "get_quotes", side_effect=fake_quotes)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def make_portfolio(self, size):
+        user = User.objects.create_user(f"user{size}", password="pw")
+        watchlist = Watchlist.objects.create(user=user, name="Main")
+        stocks = Stock.objects.bulk_create(
+            Stock(user=user, symbol=f"S{size}X{i}", name=f"Symbol {i}", shares=1, avgPrice=50)
+            for i in range(size)
+        )
+        watchlist.stocks.add(*stocks)
+        today = timezone.localdate()
+        PriceHistory.objects.bulk_create(
+            PriceHistory(symbol=stock.symbol, date=today - timedelta(days=day),
+                         open=1, high=1, low=1, close=1, volume=1)
+            for stock in stocks
+            for day in range(3)
+        )
+        # Every alert is crossed at the patched price of 100.
+        Alert.objects.bulk_create(
+            Alert(stock=stock, symbol=stock.symbol, type="above", message="Up",
+                  severity="high", triggerPrice=90)
+            for stock in stocks
+        )
+        client = APIClient()
+        client.force_authenticate(user)
+        return client, watchlist, stocks
+
+    def assertBudget(self, queries, request):
+        for size in SIZES:
+            with self.subTest(size=size):
+                cache.clear()
+                client, watchlist, stocks = self.make_portfolio(size)
+                with self.assertNumQueries(queries):
+                    response = request(client, watchlist, stocks)
+                self.assertLess(response.status_code, 400)
+
+    def test_watchlist_list(self):
+        self.assertBudget(2, lambda client, watchlist, stocks: client.get("/watchlists/add/"))
+
+    def test_watchlist_detail_overview(self):
+        self.assertBudget(
+            4, lambda client, watchlist, stocks: client.get(f"/watchlists/{watchlist.id}/overview/")
+        )
+
+    def test_overall_overview(self):
+        self.assertBudget(2, lambda client, watchlist, stocks: client.get("/watchlist/overview/"))
+
+    def test_remove_stock(self):
+        self.assertBudget(
+            4,
+            lambda client, watchlist, stocks: client.delete(
+                f"/watchlists/{watchlist.id}/remove-stock/{stocks[0].id}/"
+            ),
+        )
+
+    def test_toggle_pin(self):
+        self.assertBudget(
+            4,
+            lambda client, watchlist, stocks: client.post(
+                f"/watchlists/{watchlist.id}/stocks/{stocks[0].id}/toggle-pin/"
+            ),
+        )
+
+    @mock.patch("stocks.tasks.deliver_alert_updates.delay")
+    @mock.patch("stocks.tasks.deliver_alert_emails.delay")
+    def test_check_stock_alerts(self, deliver_emails, deliver_updates):
+        for size in SIZES:
+            with self.subTest(size=size):
+                cache.clear()
+                self.make_portfolio(size)
+                # Index rebuild, locked select, bulk update, and the
+                # savepoint pair around the transaction.
+                with self.assertNumQueries(5):
+                    check_stock_alerts()
+                self.assertEqual(Alert.objects.filter(triggered=False).count(), 0)
+
+
+class PortfolioSnapshotTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user("holder", password="pw")
+        self.stock = Stock.objects.create(user=self.user, symbol="AAA", name="A", shares=1, avgPrice=10)
+
+    def test_saving_a_stock_drops_the_snapshot(self):
+        self.assertEqual(portfolio.load(self.user.id)["shares"].tolist(), [1.0])
+        with self.captureOnCommitCallbacks(execute=True):
+            Stock.objects.filter(pk=self.stock.pk).update(shares=5)
+            self.stock.refresh_from_db()
+            self.stock.save()
+        self.assertEqual(portfolio.load(self.user.id)["shares"].tolist(), [5.0])
+
+    @mock.patch.object(market_data, "get_quote", return_value={"regularMarketPrice": 20.0, "longName": "B"})
+    def test_adding_stock_updates_the_snapshot_in_place(self, get_quote):
+        watchlist = Watchlist.objects.create(user=self.user, name="Main")
+        client = APIClient()
+        client.force_authenticate(self.user)
+        portfolio.load(self.user.id)
+        for symbol in ("AAA", "BBB"):
+            with self.captureOnCommitCallbacks(execute=True):
+                response = client.post(f"/watchlists/{watchlist.id}/add-stock/",
+                                       {"symbol": symbol, "shares": 1, "purchasePrice": 20})
+            self.assertEqual(response.status_code, 201)
+
+        with mock.patch.object(portfolio, "_build") as build:
+            snapshot = portfolio.load(self.user.id)
+        build.assert_not_called()
+        self.assertEqual(snapshot["version"], 2)
+        self.assertEqual(snapshot["symbols"], ["AAA", "BBB"])
+        self.assertEqual(snapshot["shares"].tolist(), [2.0, 1.0])
+        self.assertEqual(snapshot["avg_prices"].tolist(), [15.0, 20.0])
+
+    def test_snapshot_built_before_a_change_is_rebuilt(self):
+        # A build that read the rows before a concurrent change committed.
+        stale = portfolio._build(self.user.id, portfolio.version(self.user.id))
+        Stock.objects.filter(pk=self.stock.pk).update(shares=7)
+        portfolio.touch(self.user.id)
+        cache.set(portfolio._key(self.user.id), stale)
+        self.assertEqual(portfolio.load(self.user.id)["shares"].tolist(), [7.0])
+
+
+class RecentClosesTests(TestCase):
+    def setUp(self):
+        caches[settings.MARKET_DATA_CACHE_ALIAS].clear()
+
+    @mock.patch.object(market_data, "get_bars", return_value={})
+    def test_failed_backfill_is_not_retried_on_every_request(self, get_bars):
+        for _ in range(3):
+            self.assertEqual(history.recent_closes(["GONE"]), {"GONE": history.empty_series()})
+        get_bars.assert_called_once()
+
+
+class AlertDeliveryTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        user = User.objects.create_user("alerted", password="pw", email="alerted@example.com")
+        stock = Stock.objects.create(user=user, symbol="AAA", name="A", shares=1, avgPrice=10)
+        self.alert = Alert.objects.create(stock=stock, symbol="AAA", type="above", message="Up",
+                                          severity="high", triggerPrice=90)
+
+    def test_email_is_sent_once(self):
+        self.assertEqual(deliver_alert_emails.run([[self.alert.id, 100.0]]), 1)
+        self.assertEqual(deliver_alert_emails.run([[self.alert.id, 100.0]]), 0)
+        self.assertEqual(len(mail.outbox), 1)
+
+    def test_claim_of_a_dead_attempt_lapses(self):
+        # Eager retries run at once, so move the cache's clock on by each
+        # retry's countdown, as the broker would.
+        now = [time.time()]
+        countdowns = []
+        retry = deliver_alert_emails.retry
+
+        def retry_later(*args, countdown=None, **kwargs):
+            countdowns.append(countdown)
+            now[0] += countdown
+            return retry(*args, countdown=countdown, **kwargs)
+
+        with mock.patch("time.time", lambda: now[0]), \
+                mock.patch.object(deliver_alert_emails, "retry", retry_later):
+            # An attempt that claimed the alert and died before sending.
+            tasks._claim("email", self.alert.id)
+            result = deliver_alert_emails.apply(args=[[[self.alert.id, 100.0]]])
+
+        self.assertEqual(result.get(), 1)
+        self.assertEqual(len(mail.outbox), 1)
+        self.assertEqual(countdowns, [settings.ALERT_NOTIFICATION_CLAIM_TTL])
+
+
+class MetricsAccessTests(TestCase):
+    def test_without_a_token_only_admins_may_scrape(self):
+        client = APIClient()
+        self.assertIn(client.get("/metrics/").status_code, (401, 403))
+        client.force_authenticate(User.objects.create_user("member", password="pw"))
+        self.assertEqual(client.get("/metrics/").status_code, 403)
+        client.force_authenticate(User.objects.create_user("admin", password="pw", is_staff=True))
+        self.assertEqual(client.get("/metrics/").status_code, 200)
+
+    @override_settings(METRICS_TOKEN="secret")
+    def test_with_a_token_scrapers_must_send_it(self):
+        client = APIClient()
+        self.assertEqual(client.get("/metrics/").status_code, 403)
+        self.assertEqual(client.get("/metrics/", HTTP_AUTHORIZATION="Bearer secret").status_code, 200)
+
+
+class CacheLockTests(TestCase):
+    def setUp(self):
+        cache.clear()
+
+    def test_waits_only_as_long_as_asked(self):
+        with cache_lock("test:lock", lease=30):
+            start = time.monotonic()
+            with self.assertRaises(TimeoutError):
+                with cache_lock("test:lock", lease=30, wait=0.1):
+                    pass
+            self.assertLess(time.monotonic() - start, 5)
+
+    def test_overrunning_holder_keeps_its_hands_off_the_next_lock(self):
+        with cache_lock("test:lock"):
+            # The lease ran out and someone else took the lock.
+            cache.set("test:lock", "other")
+        self.assertEqual(cache.get("test:lock"), "other")
+
+
+class _StatusAdapter(BaseAdapter):
+    """Answers every request with ``status`` and an empty JSON body."""
+
+    def __init__(self, status):
+        super().__init__()
+        self.status = status
+
+    def send(self, request, **kwargs):
+        response = Response()
+        response.status_code = self.status
+        response.url = request.url
+        response.request = request
+        response._content = b"{}"
+        return response
+
+    def close(self):
+        pass
+
+
+class _Ticker:
+    """Fails the way yfinance 0.2.55 ``Ticker.info`` does on an HTTP error."""
+
+    def __init__(self, symbol, session):
+        self.symbol, self.session = symbol, session
+
+    @property
+    def info(self):
+        url = f"https://query2.finance.yahoo.com/v10/finance/quoteSummary/{self.symbol}"
+        try:
+            result = self.session.get(url)
+            result.raise_for_status()
+        except HTTPError:
+            result = None
+        result.update({})
+
+
+class YahooUnknownSymbolTests(TestCase):
+    def setUp(self):
+        caches[settings.MARKET_DATA_CACHE_ALIAS].clear()
+        market_data.upstream.record_success()
+        self.provider = YahooFinanceProvider()
+        for patcher in (
+            mock.patch.object(market_data, "get_provider", return_value=self.provider),
+            mock.patch("stocks.providers.yahoo.yf.Ticker", side_effect=_Ticker),
+        ):
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def test_unknown_symbols_are_negative_cached_without_tripping_the_breaker(self):
+        self.provider.session.mount("https://", _StatusAdapter(404))
+        failures = market_data.upstream.counters["failures"]
+        for _ in range(settings.MARKET_DATA_BREAKER_THRESHOLD + 1):
+            self.assertEqual(market_data.get_quote("BOGUS"), {})
+        for symbol in ("BOGUS1", "BOGUS2"):
+            self.assertEqual(market_data.get_quote(symbol), {})
+        self.assertEqual(market_data.upstream.state, CLOSED)
+        self.assertEqual(market_data.upstream.counters["failures"], failures)
+        self.assertGreater(market_data.cache_stats()["negativeHits"], 0)
+
+    def test_server_errors_still_count_as_failures(self):
+        self.provider.session.mount("https://", _StatusAdapter(500))
+        failures = market_data.upstream.counters["failures"]
+        with self.assertRaises(AttributeError):
+            market_data.get_quote("AAPL")
+        self.assertEqual(market_data.upstream.counters["failures"], failures + 1)
+
+
+class SubscriptionTests(TestCase):
+    def setUp(self):
+        subscriptions._local_registry.watchers.clear()
+
+    def test_symbols_stay_active_while_any_connection_watches_them(self):
+        subscriptions.subscribe("one", {"AAA", "BBB"})
+        subscriptions.subscribe("two", {"AAA"})
+        subscriptions.unsubscribe("one", {"AAA", "BBB"})
+        self.assertEqual(subscriptions.active_symbols(), ["AAA"])
+
+    def test_unrefreshed_subscriptions_lapse(self):
+        subscriptions.subscribe("crashed", {"AAA"})
+        later = time.time() + settings.PRICE_STREAM_SUBSCRIPTION_TTL + 1
+        with mock.patch("stocks.subscriptions.time.time", return_value=later):
+            self.assertEqual(subscriptions.active_symbols(), [])
+
+
+class SymbolIndexTests(TestCase):
+    def test_listings_longer_than_a_stock_symbol_are_skipped(self):
+        index = SymbolIndex.from_csv(settings.SYMBOL_LISTING_FILE)
+        max_length = Stock._meta.get_field("symbol").max_length
+        self.assertTrue(all(len(symbol) <= max_length for symbol in index.symbols))
+        self.assertEqual(index.search("essity"), [])
@@ -2,6 +2,7 @@ from django.urls import path, re_path
 from . import consumers
 from .views import (
     StockSearchView,
+    StockHistoryView,
     WatchlistListCreateView,
     WatchlistDestroyView,
     AddStockToWatchlistView,
@@ -11,12 +12,14 @@ from .views import (
     TogglePinStockView,
     AlertCreateView,
     AlertDeleteView,
-    
+    MarketDataCacheStatsView,
+    MetricsView,
 )
 
 # HTTP URL patterns
 urlpatterns = [
     path('stocks/search/', StockSearchView.as_view(), name='stock-search'),
+    path('stocks/<str:symbol>/history/', StockHistoryView.as_view(), name='stock-history'),
     path('watchlists/add/', WatchlistListCreateView.as_view(), name='watchlist-list-create'),
     path('watchlists/<int:watchlist_id>/destroy/' , WatchlistDestroyView.as_view(), name='destroy-watchlist'),
     path('watchlists/<int:watchlist_id>/add-stock/', AddStockToWatchlistView.as_view(), name='add-stock-watchlist'),
@@ -26,6 +29,8 @@ urlpatterns = [
     path('watchlists/<int:watchlist_id>/stocks/<int:stock_id>/toggle-pin/', TogglePinStockView.as_view(), name='toggle-pin-stock'),
     path('alerts/<int:stock_id>/add/', AlertCreateView.as_view(), name='add-alert'),
     path('alerts/<int:alert_id>/delete/', AlertDeleteView.as_view(), name='delete-alert'),
+    path('market-data/cache-stats/', MarketDataCacheStatsView.as_view(), name='market-data-cache-stats'),
+    path('metrics/', MetricsView.as_view(), name='metrics'),
     
 
 ]
@@ -33,4 +38,5 @@ urlpatterns = [
 # WebSocket URL patterns
 websocket_urlpatterns = [
     re_path(r'ws/alerts/$', consumers.AlertConsumer.as_asgi()),
+    re_path(r'ws/prices/$', consumers.PriceConsumer.as_asgi()),
 ]
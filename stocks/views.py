@@ -1,12 +1,27 @@
-import yfinance as yf
+import hashlib
+import logging
+import time
 from datetime import datetime
+from django.conf import settings
+from django.db import transaction
+from django.http import HttpResponse
+from django.utils.decorators import method_decorator
+from django.views.decorators.http import condition
+from django.views.decorators.vary import vary_on_headers
 from rest_framework import generics, status
 from rest_framework.views import APIView
 from rest_framework.response import Response
-from rest_framework.permissions import IsAuthenticated, AllowAny
+from rest_framework.permissions import IsAuthenticated, AllowAny, IsAdminUser
 
+from . import alert_index, charts, history, instrumentation, market_data, portfolio, symbol_index
+from .circuit_breaker import STATE_VALUES, CircuitOpen
+from .listing import PositionPagination, WatchlistPagination, requested_fields
+from .renderers import SERIES_RENDERERS, present_series
 from .models import Stock, Watchlist, Alert
 from .serializers import StockSerializer, WatchlistSerializer, AlertSerializer
+from .subscriptions import SYMBOL_PATTERN
+
+logger = logging.getLogger(__name__)
 
 
 # ----- 1. Stock Search using yfinance -----
@@ -16,31 +31,52 @@ class StockSearchView(APIView):
     def get(self, request, *args, **kwargs):
         query = request.GET.get("query")
         if not query:
-            print("Error: Query parameter is required.")
+            logger.debug("Stock search rejected: query parameter missing")
             return Response(
                 {"error": "Query parameter is required."},
                 status=status.HTTP_400_BAD_REQUEST
             )
 
-        ticker = yf.Ticker(query.upper())
+        # Autocomplete is answered from the local listing; upstream is only
+        # asked once the user picks a symbol.
+        if request.GET.get("mode") == "autocomplete":
+            try:
+                limit = int(request.GET.get("limit", settings.SYMBOL_AUTOCOMPLETE_LIMIT))
+            except ValueError:
+                return Response(
+                    {"error": "limit must be an integer."},
+                    status=status.HTTP_400_BAD_REQUEST
+                )
+            limit = max(1, min(limit, settings.SYMBOL_AUTOCOMPLETE_MAX_LIMIT))
+            return Response(
+                {"results": symbol_index.search(query, limit)},
+                status=status.HTTP_200_OK
+            )
+
         try:
-            info = ticker.info
-            print(f"Ticker info for {query.upper()}: {info}")
+            info = market_data.get_quote(query)
+            price = info.get("regularMarketPrice")
+            # An empty quote is a remembered miss: upstream had nothing for
+            # this symbol, so its history would not have a price either.
+            if price is None and info:
+                hist = market_data.get_history(query, period="1d")
+                if hist is not None:
+                    price = float(hist["Close"].iloc[-1])
+        except CircuitOpen:
+            logger.info("Market data unavailable for %s: circuit open", query)
+            return Response(
+                {"error": "Market data is temporarily unavailable. Please try again shortly."},
+                status=status.HTTP_503_SERVICE_UNAVAILABLE
+            )
         except Exception as e:
-            print(f"Error fetching data for {query}: {str(e)}")
+            logger.warning("Error fetching data for %s", query, exc_info=True)
             return Response(
                 {"error": f"Error fetching data for {query}: {str(e)}"},
                 status=status.HTTP_500_INTERNAL_SERVER_ERROR
             )
 
-        price = info.get("regularMarketPrice")
         if price is None:
-            hist = ticker.history(period="1d")
-            if not hist.empty:
-                price = hist["Close"].iloc[-1]
-
-        if price is None:
-            print("Could not retrieve price for this ticker.")
+            logger.info("Could not retrieve price for %s", query)
             return Response(
                 {"error": "Could not retrieve price for this ticker."},
                 status=status.HTTP_404_NOT_FOUND
@@ -54,25 +90,107 @@ class StockSearchView(APIView):
             "volume": info.get("regularMarketVolume", 0),
             "marketCap": info.get("marketCap", "N/A")
         }
-        print(f"Search result: {search_result}")
+        logger.debug("Search result for %s: %s", query, search_result)
         return Response(search_result, status=status.HTTP_200_OK)
 
 
+# Close-price chart for a symbol over a configurable range.
+class StockHistoryView(APIView):
+    """
+    Returns ``symbol``'s closes over ``range`` (1d to max, default 1mo) at
+    ``interval`` (defaults by range), downsampled with LTTB to at most
+    ``points`` points (default ``CHART_DEFAULT_POINTS``).
+    """
+    permission_classes = [IsAuthenticated]
+    renderer_classes = SERIES_RENDERERS
+
+    @method_decorator(vary_on_headers("Accept"))
+    def get(self, request, symbol, *args, **kwargs):
+        symbol = symbol.upper()
+        if not SYMBOL_PATTERN.match(symbol):
+            return Response(
+                {"error": "Invalid symbol."},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        range_ = request.GET.get("range", "1mo")
+        if range_ not in charts.RANGES:
+            return Response(
+                {"error": f"range must be one of: {', '.join(charts.RANGES)}."},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        interval = request.GET.get("interval") or charts.default_interval(range_)
+        if interval not in charts.INTERVALS:
+            return Response(
+                {"error": f"interval must be one of: {', '.join(charts.INTERVALS)}."},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        if interval in charts.INTRADAY_INTERVALS and range_ not in charts.INTRADAY_RANGES:
+            return Response(
+                {"error": f"Intraday intervals are only available for ranges: {', '.join(charts.INTRADAY_RANGES)}."},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        try:
+            points = int(request.GET.get("points", settings.CHART_DEFAULT_POINTS))
+        except ValueError:
+            return Response(
+                {"error": "points must be an integer."},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        points = max(charts.MIN_POINTS, min(points, settings.CHART_MAX_POINTS))
+
+        try:
+            data = charts.series(symbol, range_, interval, points)
+        except CircuitOpen:
+            logger.info("Market data unavailable for %s: circuit open", symbol)
+            return Response(
+                {"error": "Market data is temporarily unavailable. Please try again shortly."},
+                status=status.HTTP_503_SERVICE_UNAVAILABLE
+            )
+        except Exception as e:
+            logger.warning("Error fetching history for %s", symbol, exc_info=True)
+            return Response(
+                {"error": f"Error fetching history for {symbol}: {str(e)}"},
+                status=status.HTTP_500_INTERNAL_SERVER_ERROR
+            )
+
+        if data is None:
+            logger.info("No price history for %s", symbol)
+            return Response(
+                {"error": f"No price history found for {symbol}."},
+                status=status.HTTP_404_NOT_FOUND
+            )
+        return Response(
+            {"symbol": symbol, "range": range_, "interval": interval, "data": present_series(request, data)},
+            status=status.HTTP_200_OK
+        )
+
+
 # ----- 2. Watchlist Endpoints -----
 
 # List and create watchlists for the authenticated user.
 class WatchlistListCreateView(generics.ListCreateAPIView):
     serializer_class = WatchlistSerializer
     permission_classes = [IsAuthenticated]
+    pagination_class = WatchlistPagination
+
+    def listed_fields(self):
+        return requested_fields(self.request, WatchlistSerializer.Meta.fields)
 
     def get_queryset(self):
-        qs = Watchlist.objects.filter(user=self.request.user)
-        print(f"Retrieved watchlists for user {self.request.user}: {list(qs)}")
-        return qs
+        queryset = Watchlist.objects.filter(user=self.request.user)
+        if self.request.method == "GET" and "stocks" not in self.listed_fields():
+            return queryset
+        # Prefetch nested stocks so serializing N watchlists costs two queries.
+        return queryset.prefetch_related("stocks")
+
+    def get_serializer(self, *args, **kwargs):
+        if self.request.method == "GET":
+            kwargs["fields"] = self.listed_fields()
+        return super().get_serializer(*args, **kwargs)
 
     def perform_create(self, serializer):
         serializer.save(user=self.request.user)
-        print(f"Created watchlist: {serializer.data}")
+        logger.info("Created watchlist %s for user %s", serializer.instance.id, self.request.user.id)
 
 
 # Destroy a specific watchlist.
@@ -82,9 +200,11 @@ class WatchlistDestroyView(generics.DestroyAPIView):
     lookup_url_kwarg = 'watchlist_id'
 
     def get_queryset(self):
-        qs = Watchlist.objects.filter(user=self.request.user)
-        print(f"Watchlist queryset for user {self.request.user}: {list(qs)}")
-        return qs
+        return Watchlist.objects.filter(user=self.request.user)
+
+    def perform_destroy(self, instance):
+        instance.delete()
+        portfolio.touch(self.request.user.id)
 
 
 # Add a stock to a specific watchlist.
@@ -96,16 +216,19 @@ class AddStockToWatchlistView(APIView):
         new_shares = request.data.get("shares")
         purchase_price = request.data.get("purchasePrice")
 
-        print(f"Received request to add stock: symbol={symbol}, shares={new_shares}, purchasePrice={purchase_price}")
+        logger.debug(
+            "Add stock request: symbol=%s shares=%s purchasePrice=%s",
+            symbol, new_shares, purchase_price,
+        )
 
         if not symbol:
-            print("Error: Stock symbol is required.")
+            logger.debug("Add stock rejected: symbol missing")
             return Response(
                 {"error": "Stock symbol is required."},
                 status=status.HTTP_400_BAD_REQUEST
             )
         if new_shares is None or purchase_price is None:
-            print("Error: Both 'shares' and 'purchasePrice' are required.")
+            logger.debug("Add stock rejected: shares or purchasePrice missing")
             return Response(
                 {"error": "Both 'shares' and 'purchasePrice' are required."},
                 status=status.HTTP_400_BAD_REQUEST
@@ -115,7 +238,7 @@ class AddStockToWatchlistView(APIView):
             new_shares = int(new_shares)
             purchase_price = float(purchase_price)
         except ValueError:
-            print("Error: Invalid data for shares or purchasePrice.")
+            logger.debug("Add stock rejected: invalid shares or purchasePrice")
             return Response(
                 {"error": "Invalid data for shares or purchasePrice."},
                 status=status.HTTP_400_BAD_REQUEST
@@ -123,27 +246,30 @@ class AddStockToWatchlistView(APIView):
 
         try:
             watchlist = Watchlist.objects.get(id=watchlist_id, user=request.user)
-            print(f"Found watchlist: {watchlist.name}")
         except Watchlist.DoesNotExist:
-            print("Error: Watchlist not found.")
+            logger.debug("Watchlist %s not found for user %s", watchlist_id, request.user.id)
             return Response(
                 {"error": "Watchlist not found."},
                 status=status.HTTP_404_NOT_FOUND
             )
 
-        ticker = yf.Ticker(symbol.upper())
         try:
-            info = ticker.info
-            print(f"Fetched ticker info for {symbol.upper()}: {info}")
+            info = market_data.get_quote(symbol)
+        except CircuitOpen:
+            logger.info("Market data unavailable for %s: circuit open", symbol)
+            return Response(
+                {"error": "Market data is temporarily unavailable. Please try again shortly."},
+                status=status.HTTP_503_SERVICE_UNAVAILABLE
+            )
         except Exception as e:
-            print(f"Error fetching data for {symbol}: {str(e)}")
+            logger.warning("Error fetching data for %s", symbol, exc_info=True)
             return Response(
                 {"error": f"Error fetching data for {symbol}: {str(e)}"},
                 status=status.HTTP_500_INTERNAL_SERVER_ERROR
             )
 
         if info.get("regularMarketPrice") is None:
-            print(f"Error: Could not retrieve price for {symbol}.")
+            logger.info("Could not retrieve price for %s", symbol)
             return Response(
                 {"error": f"Could not retrieve price for {symbol}."},
                 status=status.HTTP_404_NOT_FOUND
@@ -151,7 +277,6 @@ class AddStockToWatchlistView(APIView):
 
         name = info.get("longName", symbol.upper())
         sector = info.get("sector", "Unknown")
-        print(f"Using name: {name} and sector: {sector}")
 
         stock_data = {
             "symbol": symbol.upper(),
@@ -161,24 +286,27 @@ class AddStockToWatchlistView(APIView):
             "sector": sector,
         }
 
-        try:
-            stock = Stock.objects.get(user=request.user, symbol=stock_data["symbol"])
-            print(f"Stock already exists. Current shares: {stock.shares}, avgPrice: {stock.avgPrice}")
-            existing_shares = stock.shares
-            existing_avg = float(stock.avgPrice)
-            total_shares = existing_shares + new_shares
-            new_avg_price = ((existing_shares * existing_avg) + (new_shares * purchase_price)) / total_shares
-            stock.shares = total_shares
-            stock.avgPrice = new_avg_price
-            stock.sector = sector
-            stock.save()
-            print(f"Updated stock: {StockSerializer(stock).data}")
-        except Stock.DoesNotExist:
-            stock = Stock.objects.create(user=request.user, **stock_data)
-            print(f"Created new stock: {StockSerializer(stock).data}")
-
-        watchlist.stocks.add(stock)
-        print(f"Added stock {stock.symbol} to watchlist {watchlist.name}")
+        # Lock the position so concurrent adds of the same symbol neither
+        # trip the (user, symbol) constraint nor lose each other's shares.
+        # The portfolio snapshot takes the new position in place on commit.
+        with portfolio.updating_positions(), transaction.atomic():
+            stock, created = Stock.objects.select_for_update().get_or_create(
+                user=request.user, symbol=stock_data["symbol"], defaults=stock_data
+            )
+            if created:
+                logger.debug("Created stock %s (%s)", stock.id, stock.symbol)
+            else:
+                existing_shares = stock.shares
+                existing_avg = float(stock.avgPrice)
+                total_shares = existing_shares + new_shares
+                new_avg_price = ((existing_shares * existing_avg) + (new_shares * purchase_price)) / total_shares
+                stock.shares = total_shares
+                stock.avgPrice = new_avg_price
+                stock.sector = sector
+                stock.save()
+                logger.debug("Updated stock %s: shares=%s avgPrice=%s", stock.id, stock.shares, stock.avgPrice)
+            watchlist.stocks.add(stock)
+        logger.info("Added stock %s to watchlist %s", stock.symbol, watchlist.id)
 
         return Response(
             {"message": "Stock added to watchlist.", "stock": StockSerializer(stock).data},
@@ -186,6 +314,49 @@ class AddStockToWatchlistView(APIView):
         )
 
 
+def overview_etag(request, *args, **kwargs):
+    """
+    ETag for the overview endpoints, computed before any quote is fetched:
+    the user's version (positions, watchlists, pins, alerts), the quote
+    version, and the price-TTL window so cached prices are re-read once
+    they may have expired. The negotiated media type is included, as each
+    representation needs its own tag.
+    """
+    window = int(time.time() // settings.MARKET_DATA_PRICE_TTL)
+    key = "|".join(str(part) for part in (
+        request.get_full_path(),
+        getattr(request, "accepted_media_type", ""),
+        portfolio.version(request.user.id),
+        market_data.quote_version(),
+        window,
+    ))
+    return hashlib.sha1(key.encode()).hexdigest()
+
+
+def upcoming_dividend(info):
+    """The next dividend from a quote, or ``None`` if it announces none."""
+    dividend_date = info.get("dividendDate")
+    dividend_rate = info.get("dividendRate")
+    if not (dividend_date and dividend_rate):
+        return None
+    try:
+        payment_date = datetime.fromtimestamp(dividend_date).strftime("%Y-%m-%d")
+    except Exception:
+        payment_date = None
+    try:
+        current_price = float(info.get("regularMarketPrice", 0))
+    except (TypeError, ValueError):
+        current_price = 0.0
+    dividend_yield = info.get("dividendYield")
+    if dividend_yield is None and current_price:
+        dividend_yield = round(dividend_rate / current_price, 4)
+    return {
+        "paymentDate": payment_date,
+        "amount": float(dividend_rate),
+        "yield": dividend_yield if dividend_yield is not None else 0.0
+    }
+
+
 # ----- 3. Detailed Overview for a Specific Watchlist -----
 class WatchlistDetailOverviewView(APIView):
     """
@@ -193,78 +364,92 @@ class WatchlistDetailOverviewView(APIView):
     For each stock, returns:
       - symbol, name, price, change, alerts, pinned, sector, marketCap,
         shares, avgPrice, and historical data for the last 7 days.
+    ``fields=`` limits each entry to the listed fields; quotes, alerts and
+    chart data are only loaded when a field needs them.
     """
     permission_classes = [IsAuthenticated]
-
+    renderer_classes = SERIES_RENDERERS
+    FIELDS = (
+        "id", "symbol", "name", "price", "change", "alerts", "pinned",
+        "sector", "marketCap", "shares", "avgPrice", "chartData",
+    )
+    QUOTE_FIELDS = {"price", "change", "marketCap"}
+
+    @method_decorator(vary_on_headers("Accept"))
+    @method_decorator(condition(etag_func=overview_etag))
     def get(self, request, watchlist_id, *args, **kwargs):
         try:
             watchlist = Watchlist.objects.get(id=watchlist_id, user=request.user)
-            print(f"Retrieved watchlist: {watchlist.name}")
         except Watchlist.DoesNotExist:
-            print("Error: Watchlist not found.")
+            logger.debug("Watchlist %s not found for user %s", watchlist_id, request.user.id)
             return Response(
                 {"error": "Watchlist not found."},
                 status=status.HTTP_404_NOT_FOUND
             )
 
-        overview = []
-        for stock in watchlist.stocks.all():
-            print(f"Processing stock: {stock.symbol}")
-            ticker = yf.Ticker(stock.symbol)
-            try:
-                info = ticker.info
-                print(f"Ticker info for {stock.symbol}: {info}")
-            except Exception as e:
-                print(f"Error fetching info for {stock.symbol}: {str(e)}")
-                continue
-
-            current_price = info.get("regularMarketPrice", 0)
-            try:
-                current_price = float(current_price)
-            except (TypeError, ValueError):
-                current_price = 0.0
-
-            history = ticker.history(period="7d")
-            chart_data = []
-            if not history.empty and "Close" in history.columns:
-                for date, price in history["Close"].items():
-                    chart_data.append({
-                        "date": date.strftime("%Y-%m-%d"),
-                        "price": round(float(price), 2)
-                    })
-                print(f"Historical chart data for {stock.symbol}: {chart_data}")
-            else:
-                print(f"No historical data found for {stock.symbol}.")
-
-            alerts = []
-            for alert in stock.alerts.all():
-                alerts.append({
-                    "symbol": alert.symbol,
-                    "type": alert.type,
-                    "message": alert.message,
-                    "severity": alert.severity,
-                    "timestamp": alert.timestamp.isoformat(),
-                    "triggerPrice": float(alert.triggerPrice)
-                })
-            print(f"Alerts for {stock.symbol}: {alerts}")
+        fields = requested_fields(request, self.FIELDS)
+        stocks = watchlist.stocks.all()
+        if "alerts" in fields:
+            stocks = stocks.prefetch_related("alerts")
+        paginator = PositionPagination()
+        page = paginator.paginate_queryset(stocks, request, view=self)
+        stocks = list(stocks) if page is None else page
+        symbols = [stock.symbol for stock in stocks]
+        # Fetch quotes for the whole watchlist at once; charts come from the
+        # stored price history instead of upstream.
+        quotes = market_data.get_quotes(symbols) if fields & self.QUOTE_FIELDS else None
+        histories = history.recent_closes(symbols, days=7) if "chartData" in fields else {}
 
+        overview = []
+        for stock in stocks:
             stock_overview = {
                 "id": stock.id,
                 "symbol": stock.symbol,
                 "name": stock.name,
-                "price": current_price,
-                "change": info.get("regularMarketChange", 0.0),
-                "alerts": alerts,
                 "pinned": stock.is_pinned,
                 "sector": stock.sector,
-                "marketCap": info.get("marketCap", "N/A"),
                 "shares": stock.shares,
                 "avgPrice": float(stock.avgPrice),
-                "chartData": chart_data,
             }
-            overview.append(stock_overview)
-            print(f"Overview for {stock.symbol}: {stock_overview}")
 
+            if quotes is not None:
+                info = quotes.get(stock.symbol)
+                if info is None:
+                    logger.warning("No quote available for %s", stock.symbol)
+                    continue
+
+                current_price = info.get("regularMarketPrice", 0)
+                try:
+                    current_price = float(current_price)
+                except (TypeError, ValueError):
+                    current_price = 0.0
+                stock_overview["price"] = current_price
+                stock_overview["change"] = info.get("regularMarketChange", 0.0)
+                stock_overview["marketCap"] = info.get("marketCap", "N/A")
+
+            if "chartData" in fields:
+                chart_data = histories.get(stock.symbol) or history.empty_series()
+                if not chart_data["dates"]:
+                    logger.debug("No historical data found for %s", stock.symbol)
+                stock_overview["chartData"] = present_series(request, chart_data)
+
+            if "alerts" in fields:
+                alerts = []
+                for alert in stock.alerts.all():
+                    alerts.append({
+                        "symbol": alert.symbol,
+                        "type": alert.type,
+                        "message": alert.message,
+                        "severity": alert.severity,
+                        "timestamp": alert.timestamp.isoformat(),
+                        "triggerPrice": float(alert.triggerPrice)
+                    })
+                stock_overview["alerts"] = alerts
+
+            overview.append({name: stock_overview[name] for name in self.FIELDS if name in fields})
+
+        if page is not None:
+            return paginator.get_paginated_response(overview)
         return Response(overview, status=status.HTTP_200_OK)
 
 
@@ -276,77 +461,61 @@ class WatchlistOverviewView(APIView):
       - overallTotalValue: Sum of (currentPrice * shares) for each stock.
       - overallTotalGainLoss: Sum of (currentPrice - avgPrice) * shares.
       - For each stock: last 7 days historical data and upcoming dividend details (if available).
+    ``fields=`` limits the totals and per-stock fields returned; quotes and
+    history are only loaded when a field needs them. Totals always cover
+    every position, also when the stocks are paginated.
     """
     permission_classes = [IsAuthenticated]
+    renderer_classes = SERIES_RENDERERS
+    TOTAL_FIELDS = ("overallTotalValue", "overallTotalGainLoss")
+    STOCK_FIELDS = ("symbol", "historicalData", "mostRecentDividend")
 
+    @method_decorator(vary_on_headers("Accept"))
+    @method_decorator(condition(etag_func=overview_etag))
     def get(self, request, *args, **kwargs):
-        stocks = Stock.objects.filter(user=request.user)
-        overall_total_value = 0.0
-        overall_total_gainloss = 0.0
-        stocks_overview = []
-
-        for stock in stocks:
-            print(f"Processing overall data for stock: {stock.symbol}")
-            ticker = yf.Ticker(stock.symbol)
-            try:
-                info = ticker.info
-                print(f"Ticker info for {stock.symbol}: {info}")
-            except Exception as e:
-                print(f"Error fetching info for {stock.symbol}: {str(e)}")
-                continue
-
-            current_price = info.get("regularMarketPrice", 0)
-            try:
-                current_price = float(current_price)
-            except (TypeError, ValueError):
-                current_price = 0.0
-
-            total_value = current_price * stock.shares
-            gain_loss = (current_price - float(stock.avgPrice)) * stock.shares
-
-            overall_total_value += total_value
-            overall_total_gainloss += gain_loss
-
-            history = ticker.history(period="7d")
-            hist_data = []
-            if not history.empty and "Close" in history.columns:
-                for date, price in history["Close"].items():
-                    hist_data.append({
-                        "date": date.strftime("%Y-%m-%d"),
-                        "price": round(float(price), 2)
-                    })
-                print(f"Historical data for {stock.symbol}: {hist_data}")
+        fields = requested_fields(request, self.TOTAL_FIELDS + self.STOCK_FIELDS)
+        totals = [name for name in self.TOTAL_FIELDS if name in fields]
+        # Positions come from the cached snapshot and are valued in one
+        # vectorized pass against the (normally warm) quote cache.
+        snapshot = portfolio.load(request.user.id)
+        paginator = PositionPagination()
+        page = paginator.paginate_keys(snapshot["symbols"], request)
+        symbols = snapshot["symbols"] if page is None else page
+
+        quotes = None
+        if totals:
+            quotes = market_data.get_quotes(snapshot["symbols"])
+        elif "mostRecentDividend" in fields:
+            quotes = market_data.get_quotes(symbols)
+        histories = history.recent_closes(symbols, days=7) if "historicalData" in fields else {}
+
+        overall = {}
+        if totals:
+            prices = portfolio.price_vector(snapshot, quotes)
+            values = dict(zip(self.TOTAL_FIELDS, portfolio.revalue(snapshot, prices)))
+            overall.update((name, values[name]) for name in totals)
 
-            upcoming_dividend = None
-            dividend_date = info.get("dividendDate")
-            dividend_rate = info.get("dividendRate")
-            if dividend_date and dividend_rate:
-                try:
-                    payment_date = datetime.fromtimestamp(dividend_date).strftime("%Y-%m-%d")
-                except Exception:
-                    payment_date = None
-                dividend_yield = info.get("dividendYield")
-                if dividend_yield is None and current_price:
-                    dividend_yield = round(dividend_rate / current_price, 4)
-                upcoming_dividend = {
-                    "paymentDate": payment_date,
-                    "amount": float(dividend_rate),
-                    "yield": dividend_yield if dividend_yield is not None else 0.0
-                }
-                print(f"Upcoming dividend for {stock.symbol}: {upcoming_dividend}")
-
-            stocks_overview.append({
-                "symbol": stock.symbol,
-                "historicalData": hist_data,
-                "mostRecentDividend": upcoming_dividend
-            })
-
-        overall = {
-            "overallTotalValue": overall_total_value,
-            "overallTotalGainLoss": overall_total_gainloss,
-            "stocks": stocks_overview
-        }
-        print(f"Overall watchlist overview: {overall}")
+        stocks_overview = []
+        for symbol in symbols:
+            stock_overview = {"symbol": symbol}
+            if quotes is not None:
+                info = quotes.get(symbol)
+                if info is None:
+                    logger.warning("No quote available for %s", symbol)
+                    continue
+                if "mostRecentDividend" in fields:
+                    stock_overview["mostRecentDividend"] = upcoming_dividend(info)
+            if "historicalData" in fields:
+                stock_overview["historicalData"] = present_series(request, histories.get(symbol) or history.empty_series())
+            stocks_overview.append({name: stock_overview[name] for name in self.STOCK_FIELDS if name in fields})
+
+        overall["stocks"] = stocks_overview
+        if page is not None:
+            overall["next"] = paginator.next_link
+            overall["previous"] = paginator.previous_link
+        logger.debug(
+            "Overall overview for user %s: %d stocks", request.user.id, len(stocks_overview),
+        )
 
         return Response(overall, status=status.HTTP_200_OK)
 
@@ -360,9 +529,8 @@ class AlertCreateView(APIView):
     def post(self, request, stock_id, *args, **kwargs):
         try:
             stock = Stock.objects.get(id=stock_id, user=request.user)
-            print(f"Found stock for alert: {stock.symbol}")
         except Stock.DoesNotExist:
-            print("Error: Stock not found for alert creation.")
+            logger.debug("Stock %s not found for alert creation", stock_id)
             return Response(
                 {"error": "Stock not found."},
                 status=status.HTTP_404_NOT_FOUND
@@ -370,10 +538,12 @@ class AlertCreateView(APIView):
 
         serializer = AlertSerializer(data=request.data)
         if serializer.is_valid():
-            serializer.save(stock=stock)
-            print(f"Created alert: {serializer.data}")
+            alert = serializer.save(stock=stock)
+            alert_index.add(alert)
+            portfolio.touch(request.user.id)
+            logger.info("Created alert %s for %s", serializer.instance.id, stock.symbol)
             return Response(serializer.data, status=status.HTTP_201_CREATED)
-        print(f"Alert creation errors: {serializer.errors}")
+        logger.debug("Alert creation errors: %s", serializer.errors)
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
 
@@ -384,16 +554,17 @@ class AlertDeleteView(APIView):
     def delete(self, request, alert_id, *args, **kwargs):
         try:
             alert = Alert.objects.get(id=alert_id, stock__user=request.user)
-            print(f"Found alert to delete: {alert}")
         except Alert.DoesNotExist:
-            print("Error: Alert not found for deletion.")
+            logger.debug("Alert %s not found for deletion", alert_id)
             return Response(
                 {"error": "Alert not found."},
                 status=status.HTTP_404_NOT_FOUND
             )
 
         alert.delete()
-        print(f"Deleted alert with id: {alert_id}")
+        alert_index.remove({alert.symbol.upper(): [alert_id]})
+        portfolio.touch(request.user.id)
+        logger.info("Deleted alert %s", alert_id)
         return Response(
             {"message": "Alert deleted successfully."},
             status=status.HTTP_204_NO_CONTENT
@@ -407,9 +578,8 @@ class RemoveStockFromWatchlistView(APIView):
     def delete(self, request, watchlist_id, stock_id, *args, **kwargs):
         try:
             watchlist = Watchlist.objects.get(id=watchlist_id, user=request.user)
-            print(f"Found watchlist for removal: {watchlist.name}")
         except Watchlist.DoesNotExist:
-            print("Error: Watchlist not found for removal.")
+            logger.debug("Watchlist %s not found for removal", watchlist_id)
             return Response(
                 {"error": "Watchlist not found."},
                 status=status.HTTP_404_NOT_FOUND
@@ -417,23 +587,23 @@ class RemoveStockFromWatchlistView(APIView):
 
         try:
             stock = Stock.objects.get(id=stock_id, user=request.user)
-            print(f"Found stock for removal: {stock.symbol}")
         except Stock.DoesNotExist:
-            print("Error: Stock not found for removal.")
+            logger.debug("Stock %s not found for removal", stock_id)
             return Response(
                 {"error": "Stock not found."},
                 status=status.HTTP_404_NOT_FOUND
             )
 
-        if stock not in watchlist.stocks.all():
-            print("Error: Stock is not in this watchlist.")
+        if not watchlist.stocks.filter(id=stock.id).exists():
+            logger.debug("Stock %s is not in watchlist %s", stock_id, watchlist_id)
             return Response(
                 {"error": "Stock is not in this watchlist."},
                 status=status.HTTP_400_BAD_REQUEST
             )
 
         watchlist.stocks.remove(stock)
-        print(f"Removed stock {stock.symbol} from watchlist {watchlist.name}")
+        portfolio.touch(request.user.id)
+        logger.info("Removed stock %s from watchlist %s", stock.symbol, watchlist.id)
         return Response(
             {
                 "message": "Stock removed from watchlist successfully.",
@@ -466,7 +636,7 @@ class TogglePinStockView(APIView):
             )
 
         # Ensure the stock is in this watchlist
-        if stock not in watchlist.stocks.all():
+        if not watchlist.stocks.filter(id=stock.id).exists():
             return Response(
                 {"error": "Stock is not in this watchlist."},
                 status=status.HTTP_400_BAD_REQUEST
@@ -475,6 +645,7 @@ class TogglePinStockView(APIView):
         # Toggle the pin flag and save
         stock.is_pinned = not stock.is_pinned
         stock.save()
+        portfolio.touch(request.user.id)
 
         action = "pinned" if stock.is_pinned else "unpinned"
         return Response(
@@ -484,3 +655,74 @@ class TogglePinStockView(APIView):
             },
             status=status.HTTP_200_OK
         )
+
+
+# ----- 8. Market Data Cache Statistics -----
+class MarketDataCacheStatsView(APIView):
+    permission_classes = [IsAdminUser]
+
+    def get(self, request, *args, **kwargs):
+        symbols = Stock.objects.values_list("symbol", flat=True).distinct()
+        stats = market_data.cache_stats()
+        stats["refreshLag"] = market_data.refresh_lag(symbols)
+        return Response(stats, status=status.HTTP_200_OK)
+
+
+# ----- 9. Prometheus Metrics Endpoint -----
+class MetricsView(APIView):
+    """
+    Request, task and upstream timing histograms plus quote cache and
+    circuit breaker metrics for this process, in the Prometheus text exposition format. When
+    ``METRICS_TOKEN`` is set, scrapers must send it as a bearer token;
+    otherwise only admin users may read them.
+    """
+
+    def get_authenticators(self):
+        # The metrics token arrives in the Authorization header, where JWT
+        # authentication would reject it.
+        if settings.METRICS_TOKEN:
+            return []
+        return super().get_authenticators()
+
+    def get_permissions(self):
+        if settings.METRICS_TOKEN:
+            return [AllowAny()]
+        return [IsAdminUser()]
+
+    def get(self, request, *args, **kwargs):
+        token = settings.METRICS_TOKEN
+        if token and request.headers.get("Authorization") != f"Bearer {token}":
+            return HttpResponse(status=status.HTTP_403_FORBIDDEN)
+
+        stats = market_data.cache_stats()
+        circuit = stats["circuit"]
+        cache_lines = [
+            "# HELP stocks_market_data_cache_hits_total Quote cache hits.",
+            "# TYPE stocks_market_data_cache_hits_total counter",
+            f"stocks_market_data_cache_hits_total {stats['hits']}",
+            "# HELP stocks_market_data_cache_misses_total Quote cache misses.",
+            "# TYPE stocks_market_data_cache_misses_total counter",
+            f"stocks_market_data_cache_misses_total {stats['misses']}",
+            "# HELP stocks_market_data_stale_served_total Stale quotes served while upstream was failing.",
+            "# TYPE stocks_market_data_stale_served_total counter",
+            f"stocks_market_data_stale_served_total {stats['staleServed']}",
+            "# HELP stocks_market_data_negative_hits_total Lookups answered from the negative cache.",
+            "# TYPE stocks_market_data_negative_hits_total counter",
+            f"stocks_market_data_negative_hits_total {stats['negativeHits']}",
+            "# HELP stocks_market_data_circuit_state Upstream circuit breaker state (0 closed, 1 half-open, 2 open).",
+            "# TYPE stocks_market_data_circuit_state gauge",
+            f"stocks_market_data_circuit_state {STATE_VALUES[circuit['state']]}",
+            "# HELP stocks_market_data_upstream_failures_total Failed or timed-out upstream calls.",
+            "# TYPE stocks_market_data_upstream_failures_total counter",
+            f"stocks_market_data_upstream_failures_total {circuit['failures']}",
+            "# HELP stocks_market_data_circuit_rejected_total Upstream calls rejected while the circuit was open.",
+            "# TYPE stocks_market_data_circuit_rejected_total counter",
+            f"stocks_market_data_circuit_rejected_total {circuit['rejected']}",
+            "# HELP stocks_market_data_circuit_opened_total Times the circuit breaker opened.",
+            "# TYPE stocks_market_data_circuit_opened_total counter",
+            f"stocks_market_data_circuit_opened_total {circuit['opened']}",
+        ]
+        return HttpResponse(
+            instrumentation.render_metrics(cache_lines),
+            content_type="text/plain; version=0.0.4; charset=utf-8",
+        )